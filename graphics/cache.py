@@ -0,0 +1,174 @@
+#
+#  Graphic Videos
+#  An API for creating graphic videos in Python.
+#  Copyright Medilocus 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from typing import Any, Callable, Dict, Tuple
+from collections import OrderedDict
+import pygame
+from .props import *
+pygame.init()
+
+class StaticEntry:
+    """Cached render of one element, used by StaticCache."""
+
+    res: Tuple[int]
+    revision: int
+    props: Tuple[Property]
+    frame_range: Tuple[float]
+    surf: pygame.Surface
+    loc: Tuple[int]
+
+    def __init__(self, res: Tuple[int], revision: int, props: Tuple[Property]) -> None:
+        self.res = res
+        self.revision = revision
+        self.props = props
+        self.frame_range = (0, 0)
+        self.surf = None
+        self.loc = None
+
+
+class StaticCache:
+    """
+    Caches renders of elements whose properties don't change over a range of frames.
+    Entries are invalidated automatically when a keyframe is inserted.
+    """
+
+    hits: int
+    misses: int
+    entries: Dict[Any, StaticEntry]
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.entries = {}
+
+    def __getstate__(self):
+        # Surfaces can't be pickled, so other processes start with an empty cache.
+        return {"hits": 0, "misses": 0, "entries": {}}
+
+    def clear(self) -> None:
+        """
+        Removes all cached surfaces. Use this after changing attributes that aren't properties.
+        """
+        self.entries.clear()
+
+    def render(self, element, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        """
+        Renders element with element.render_bbox, reusing the last render if nothing changed.
+        :param element: Element to render.
+        :param res: Resolution to render.
+        :param frame: Frame to render.
+        """
+        if not element.cacheable:
+            return element.render_bbox(res, frame)
+
+        res = tuple(res)
+        entry = self.entries.get(element)
+        if entry is None or entry.revision != get_revision() or entry.res != res:
+            entry = StaticEntry(res, get_revision(), tuple(iter_props(element)))
+            self.entries[element] = entry
+
+        start, end = entry.frame_range
+        if entry.surf is not None and start <= frame < end:
+            self.hits += 1
+            return entry.surf, entry.loc
+
+        self.misses += 1
+        start, end = static_range(entry.props, frame)
+        surf, loc = element.render_bbox(res, frame)
+        if start <= frame < end and end - start > 1:
+            entry.frame_range = (start, end)
+            entry.surf = surf
+            entry.loc = loc
+        else:
+            entry.surf = None
+        return surf, loc
+
+
+class LRUCache:
+    """
+    Least recently used cache with a size budget.
+    Entries are dropped when pickled, so other processes start with an empty cache.
+    """
+
+    max_size: int
+    size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int, sizeof: Callable[[Any], int] = None) -> None:
+        """
+        Initializes cache.
+        :param max_size: Maximum total size of all values.
+        :param sizeof: Function that returns the size of a value. Each value counts as 1 if None.
+        """
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.entries = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(size=0, hits=0, misses=0, entries=OrderedDict())
+        return state
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """
+        Returns the value of key and marks it as recently used, or default if key isn't cached.
+        :param key: Key to get.
+        :param default: Value to return if key isn't cached.
+        """
+        if key not in self.entries:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key][0]
+
+    def put(self, key: Any, value: Any) -> None:
+        """
+        Stores value, evicting least recently used values until the cache fits the budget.
+        Values larger than the whole budget aren't stored.
+        :param key: Key to store.
+        :param value: Value to store.
+        """
+        size = 1 if self.sizeof is None else self.sizeof(value)
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > self.max_size:
+            return
+
+        self.entries[key] = (value, size)
+        self.size += size
+        while self.size > self.max_size:
+            self.size -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self) -> None:
+        """
+        Removes all values.
+        """
+        self.entries.clear()
+        self.size = 0
@@ -23,4 +23,5 @@ from ..props import *
 from .base import BaseElement
 from . import simple
 from . import text
+from . import batch
 pygame.init()
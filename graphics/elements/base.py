@@ -20,7 +20,7 @@
 from typing import List, Tuple
 import pygame
 from ..props import *
-from ..modifiers import Modifier
+from ..modifiers import Modifier, apply_modifiers
 pygame.init()
 
 
@@ -30,6 +30,15 @@ class BaseElement:
     show: BoolProp
     modifiers: List[Modifier]
 
+    # Whether renders can be reused while no property changes.
+    # Elements that change without their properties changing (e.g. videos) should set this to False.
+    cacheable: bool = True
+
+    # Names of properties that are distances in pixels of the frame, e.g. locations and sizes.
+    # Motion blur uses fewer subframes while only these change, and only by a few pixels.
+    # Changes of other properties (e.g. colors and angles) always use all subframes.
+    pixel_props: Tuple[str] = ()
+
     def __init__(self) -> None:
         """
         BaseElement init. Other elements should have their own init
@@ -44,9 +53,11 @@ class BaseElement:
         :param modifier: Modifier to append.
         """
         self.modifiers.append(modifier)
+        bump_revision()
 
     def extend_modifiers(self, modifiers: Tuple[Modifier]) -> None:
         self.modifiers.extend(modifiers)
+        bump_revision()
 
     def render(self, res: Tuple[int], frame: int) -> pygame.Surface:
         """
@@ -54,10 +65,44 @@ class BaseElement:
         :param res: Resolution to render.
         :param frame: Frame to render.
         """
-        surf = self.render_raw(res, frame)
-        for modifier in self.modifiers:
-            if modifier.show(frame):
-                surf = modifier.modify(surf, frame)
-        return surf
+        surf, loc = self.render_bbox(res, frame)
+        if tuple(loc) == (0, 0) and surf.get_size() == tuple(res):
+            return surf
+
+        surface = pygame.Surface(res, pygame.SRCALPHA)
+        surface.blit(surf, loc)
+        return surface
+
+    def render_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        """
+        Renders element as a surface covering only its bounding box.
+        Returns (surface, loc), where loc is the top left corner of the surface in the frame.
+        :param res: Resolution to render.
+        :param frame: Frame to render.
+        """
+        surf, loc = self.render_raw_bbox(res, frame)
+        return apply_modifiers(self.modifiers, surf, loc, res, frame)
+
+    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
+        """
+        Renders element without modifiers as a full resolution surface.
+        Elements should define either this or render_raw_bbox.
+        :param res: Resolution to render.
+        :param frame: Frame to render.
+        """
+        if type(self).render_raw_bbox is BaseElement.render_raw_bbox:
+            raise NotImplementedError(f"{type(self).__name__} must define render_raw or render_raw_bbox.")
+
+        surf, loc = self.render_raw_bbox(res, frame)
+        surface = pygame.Surface(res, pygame.SRCALPHA)
+        surface.blit(surf, loc)
+        return surface
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:...
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        """
+        Renders element without modifiers, only inside its bounding box.
+        Defaults to render_raw, placed at (0, 0), so legacy full resolution elements keep working.
+        :param res: Resolution to render.
+        :param frame: Frame to render.
+        """
+        return self.render_raw(res, frame), (0, 0)
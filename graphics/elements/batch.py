@@ -0,0 +1,148 @@
+#
+#  Graphic Videos
+#  An API for creating graphic videos in Python.
+#  Copyright Medilocus 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+from typing import Any, Tuple
+import numpy as np
+import pygame
+from pygame import gfxdraw
+from . import BaseElement
+from ..options import *
+from ..props import *
+from ..utils import *
+from ..cache import LRUCache
+pygame.init()
+
+# Rendered shapes, keyed by (shape, size, radius, color).
+sprite_cache = LRUCache(get_sprite_cache(), lambda surf: surf.get_bytesize() * surf.get_width() * surf.get_height())
+
+
+def render_sprite(shape: str, params: Tuple[int]) -> pygame.Surface:
+    """
+    Returns one shape of a ShapeBatch, which is only rendered the first time it is used.
+    Shapes are drawn like the Rect and Circle elements. The surface is shared, so it must not be changed.
+    :param shape: "rect" or "circle".
+    :param params: (width, height, corner radius, r, g, b, a) of rectangles, or (radius, r, g, b, a) of circles.
+    """
+    key = (shape, params)
+    surf = sprite_cache.get(key)
+    if surf is None:
+        if shape == "rect":
+            width, height, radius, *color = params
+            surf = pygame.Surface((width, height), pygame.SRCALPHA)
+            if radius > 0:
+                pygame.draw.rect(surf, color, (0, 0, width, height), border_radius=radius)
+            else:
+                surf.fill(color)
+        else:
+            radius, *color = params
+            # One pixel of padding for antialiasing.
+            surf = pygame.Surface((2*radius+3, 2*radius+3), pygame.SRCALPHA)
+            gfxdraw.aacircle(surf, radius+1, radius+1, radius, color)
+            gfxdraw.filled_circle(surf, radius+1, radius+1, radius, color)
+        sprite_cache.put(key, surf)
+    return surf
+
+
+def get_colors(color: Any, count: int) -> np.ndarray:
+    """
+    Returns colors as an array of shape (count, 4). Colors without alpha get an alpha of 255.
+    Meant for internal use.
+    :param color: One color (which may be in the color palette), or an array of colors.
+    """
+    if isinstance(color, str) or np.ndim(color) == 1:
+        color = get_color(color)
+    color = np.asarray(color)
+    if color.shape[-1] == 3:
+        color = np.concatenate([color, np.full(color.shape[:-1]+(1,), 255, dtype=color.dtype)], axis=-1)
+    return np.broadcast_to(color, (count, 4))
+
+
+class ShapeBatch(BaseElement):
+    """
+    Many rectangles or circles, drawn as one element.
+    Each property holds the values of all shapes, and keyframes can be inserted for some shapes only,
+    e.g. batch.loc.keyframe((100, 100), 30, index=[0, 5]).
+    All shapes are evaluated at once with NumPy, each distinct shape is drawn once and reused,
+    and all shapes are copied onto the surface with one Surface.blits call.
+    """
+
+    pixel_props = ("loc", "size", "radius")
+
+    shape: str
+    count: int
+    loc: ArrayProp
+    size: ArrayProp
+    radius: ArrayProp
+    color: ArrayProp
+
+    def __init__(self, count: int, shape: str = "rect", loc: Any = (0, 0), size: Any = (10, 10), radius: Any = None,
+            color: Any = (255, 255, 255)) -> None:
+        """
+        Initializes shape batch. Each value can be one value for all shapes, or an array with the value of each shape.
+        :param count: Number of shapes.
+        :param shape: "rect" or "circle".
+        :param loc: Top left corner (rectangles) or center (circles) location (pixels) of shapes, shape (count, 2).
+        :param size: Size (x, y) pixels of rectangles, shape (count, 2). Not used by circles.
+        :param radius: Radius (pixels) of circles, or corner radius of rectangles, shape (count,).
+            Defaults to 25 for circles and 0 for rectangles.
+        :param color: Color (rgba, 0 to 255) of shapes, shape (count, 4). The ALPHA will be set to 255 if no alpha is given.
+        """
+        super().__init__()
+        if shape not in ("rect", "circle"):
+            raise ValueError(f"Shape must be rect or circle, got {shape!r}.")
+
+        self.shape = shape
+        self.count = count
+        self.loc = ArrayProp((count, 2), int, loc)
+        self.size = ArrayProp((count, 2), int, size)
+        if radius is None:
+            radius = 25 if shape == "circle" else 0
+        self.radius = ArrayProp((count,), int, radius)
+        self.color = ArrayProp((count, 4), int, get_colors(color, count))
+
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        loc = self.loc(frame)
+        radius = np.maximum(self.radius(frame), 0)
+        color = np.clip(self.color(frame), 0, 255)
+
+        if self.shape == "rect":
+            corner = loc
+            extent = np.maximum(self.size(frame), 0)
+            params = np.column_stack([extent, radius, color])
+        else:
+            corner = loc - radius[:, None] - 1
+            extent = np.repeat(2*radius[:, None] + 3, 2, axis=1)
+            params = np.column_stack([radius, color])
+
+        # Shapes that are invisible or outside the frame aren't drawn.
+        keep = (color[:, 3] > 0) & (extent > 0).all(axis=1)
+        keep &= (corner < res).all(axis=1) & (corner+extent > 0).all(axis=1)
+        if not keep.any():
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+        corner, extent, params = corner[keep], extent[keep], params[keep]
+
+        top_left = np.maximum(corner.min(axis=0), 0)
+        bottom_right = np.minimum((corner+extent).max(axis=0), res)
+        unique, inverse = np.unique(params, axis=0, return_inverse=True)
+        sprites = [render_sprite(self.shape, tuple(row)) for row in unique.tolist()]
+        locs = (corner-top_left).tolist()
+
+        surface = pygame.Surface((bottom_right-top_left).tolist(), pygame.SRCALPHA)
+        surface.blits([(sprites[i], loc) for i, loc in zip(inverse.reshape(-1).tolist(), locs)], doreturn=False)
+        return surface, tuple(top_left.tolist())
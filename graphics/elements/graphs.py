@@ -17,12 +17,16 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from typing import Tuple
+import io
+import csv
+from typing import Any, List, Tuple
 import pygame
 import numpy as np
 from . import BaseElement
 from ..props import *
 from ..utils import *
+from ..cache import LRUCache
+from ..fonts import render_text
 import random
 pygame.init()
 
@@ -30,6 +34,8 @@ pygame.init()
 class BarGraphVert(BaseElement):
     """Vertical Bar Graph element."""
 
+    pixel_props = ("loc", "size", "border")
+
     loc: VectorProp
     size: VectorProp
     categories: Tuple[StringProp]
@@ -75,7 +81,6 @@ class BarGraphVert(BaseElement):
     def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
         # Initialize surface
         surf = pygame.Surface(res, pygame.SRCALPHA)
-        font = pygame.font.SysFont(get_font(), 20)
         surf.fill((0, 0, 0, 0))
 
         # Get current values
@@ -85,14 +90,16 @@ class BarGraphVert(BaseElement):
         border_color = self.border_color(frame)
         text_color = self.text_color(frame)
         gap = (width - 5 - len(self.categories) * 5) // len(self.categories)
+        values = [value(frame) for value in self.values]
+        max_value = max(values)
 
         # Draw bars and text for each bar
         for i in range(len(self.categories)):
             # Get values for bar
             color = self.colors[i](frame)
-            value = self.values[i](frame)
+            value = values[i]
             category = self.categories[i](frame)
-            val_h = np.interp(value, (0, max(self.values, key=lambda val: val(frame))(frame) + 1), (3, height - 100 - 5))
+            val_h = np.interp(value, (0, max_value + 1), (3, height - 100 - 5))
 
             # Calculate x and y for bar
             x = 5 + gap*i + i*5 + base_x
@@ -105,14 +112,14 @@ class BarGraphVert(BaseElement):
             if text_color == "AUTO":
                 text_color = (0,)*3
             # Create text
-            text = font.render(category, 1, text_color)
+            text = render_text(category, get_font(), 20, text_color)
             # Draw text
             surf.blit(text, (x + gap // 2 - text.get_width() // 2, height - 5 - 50 + 10))
             # Set text color for value text
             if text_color == "AUTO" and sum(color) < 120:
                 text_color = (255,)*3
             # Create text
-            text = font.render(str(value), 1, text_color)
+            text = render_text(str(value), get_font(), 20, text_color)
             # Draw text
             surf.blit(text, (x + gap // 2 - text.get_width() // 2, y + val_h//2 - text.get_height() // 2))
 
@@ -126,6 +133,8 @@ class BarGraphVert(BaseElement):
 class BarGraphHoriz(BaseElement):
     """Horizontal Bar Graph element."""
 
+    pixel_props = ("loc", "size", "border")
+
     loc: VectorProp
     size: VectorProp
     categories: Tuple[StringProp]
@@ -171,7 +180,6 @@ class BarGraphHoriz(BaseElement):
     def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
         # Initialize surface
         surf = pygame.Surface(res, pygame.SRCALPHA)
-        font = pygame.font.SysFont(get_font(), 20)
         surf.fill((0, 0, 0, 0))
 
         # Get current values
@@ -181,14 +189,16 @@ class BarGraphHoriz(BaseElement):
         border_color = self.border_color(frame)
         text_color = self.text_color(frame)
         gap = (height - 5 - len(self.categories) * 5) // len(self.categories)
+        values = [value(frame) for value in self.values]
+        max_value = max(values)
 
         # Draw bars and text for each bar
         for i in range(len(self.categories)):
             # Get values for bar
             color = self.colors[i](frame)
-            value = self.values[i](frame)
+            value = values[i]
             category = self.categories[i](frame)
-            val_w = np.interp(value, (0, max(self.values, key=lambda val: val(frame))(frame) + 1), (3, height - 100 - 5))
+            val_w = np.interp(value, (0, max_value + 1), (3, height - 100 - 5))
 
             # Calculate x and y for bar
             x = 5 + 50 + base_x
@@ -201,14 +211,14 @@ class BarGraphHoriz(BaseElement):
             if text_color == "AUTO":
                 text_color = (0,)*3
             # Create text
-            text = font.render(category, 1, text_color)
+            text = render_text(category, get_font(), 20, text_color)
             # Draw text
             surf.blit(text, (x - 10 - text.get_width(), y + gap // 2 - text.get_height() // 2))
             # Set text color for value text
             if text_color == "AUTO" and sum(color) < 120:
                 text_color = (255,)*3
             # Create text
-            text = font.render(str(value), 1, text_color)
+            text = render_text(str(value), get_font(), 20, text_color)
             # Draw text
             surf.blit(text, (x + val_w // 2 - text.get_width() // 2, y + gap // 2 - text.get_height() // 2))
 
@@ -217,3 +227,369 @@ class BarGraphHoriz(BaseElement):
         pygame.draw.rect(surf, border_color, (base_x + 50, height - border + base_y, width, border))
 
         return surf
+
+
+class CSVTable:
+    """
+    Numeric table in a CSV file, which is read in chunks of rows instead of loading the whole file.
+    The first line has the column names. The byte offset of each line is found once,
+    so any chunk of rows can be read directly.
+    """
+
+    path: str
+    columns: List[str]
+    offsets: np.ndarray
+    chunk_size: int
+
+    def __init__(self, path: str, chunk_size: int = 256) -> None:
+        """
+        Initializes table and finds the offset of each line.
+        :param path: Path of CSV file.
+        :param chunk_size: Number of rows read at once.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunks = LRUCache(8)
+
+        with open(path, "rb") as file:
+            header = file.readline()
+            self.columns = next(csv.reader([header.decode()]))
+
+            offsets = [np.array([len(header)])]
+            position = len(header)
+            while chunk := file.read(16 * 1024**2):
+                offsets.append(np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord("\n")) + position + 1)
+                position += len(chunk)
+            # The last offset is the end of the file, so row i is between offsets i and i+1.
+            offsets = np.concatenate(offsets)
+            if offsets[-1] != position:
+                offsets = np.append(offsets, position)
+            self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def shape(self) -> Tuple[int]:
+        return (len(self), len(self.columns))
+
+    def get_chunk(self, index: int) -> np.ndarray:
+        """
+        Returns chunk index of the rows as a float array.
+        Meant for internal use.
+        """
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            start = index * self.chunk_size
+            end = min(start+self.chunk_size, len(self))
+            with open(self.path, "rb") as file:
+                file.seek(int(self.offsets[start]))
+                data = file.read(int(self.offsets[end] - self.offsets[start]))
+            chunk = np.loadtxt(io.BytesIO(data), delimiter=",", dtype=np.float64, ndmin=2)
+            self.chunks.put(index, chunk)
+        return chunk
+
+    def __getitem__(self, row: int) -> np.ndarray:
+        return self.get_chunk(row // self.chunk_size)[row % self.chunk_size]
+
+
+class BarChartRace(BaseElement):
+    """
+    Horizontal bar chart race element, animated from a table of values with rows as time and columns as categories.
+    Values are interpolated between rows, and the top categories are drawn as bars sorted by value,
+    which slide to their new rank. The table is read row by row, so large tables (e.g. memory mapped arrays
+    or CSV files) are never loaded into properties.
+    """
+
+    cacheable = False
+
+    loc: VectorProp
+    size: VectorProp
+    data: Any
+    categories: List[str]
+    frames_per_row: float
+    top: int
+    colors: np.ndarray
+    text_color: VectorProp
+    font_size: IntProp
+    row_labels: List[str]
+
+    def __init__(self, loc: Tuple[int] = (0, 0), size: Tuple[int] = (1600, 900), data: Any = None, categories: List[str] = None,
+            frames_per_row: float = 30, top: int = 10, colors: Any = "AUTO", text_color: Tuple[int] = (0, 0, 0, 255),
+            font_size: int = 24, row_labels: List[str] = None) -> None:
+        """
+        Initializes bar chart race.
+        :param loc: Top left corner location (pixels) of chart.
+        :param size: Size (x, y) pixels of chart.
+        :param data: Array of shape (rows, categories), e.g. a numpy.memmap, or path of a CSV file whose first line
+            has the category names. CSV files are read in chunks.
+        :param categories: Name of each category. Uses the first line of the CSV file if None.
+        :param frames_per_row: Number of frames between rows of data.
+        :param top: Number of bars shown.
+        :param colors: Array of shape (categories, 3 or 4) with the color of each category. AUTO makes all colors random.
+        :param text_color: Color of labels.
+        :param font_size: Font size of labels.
+        :param row_labels: Label of each row (e.g. the year), shown in the bottom right corner.
+        """
+        super().__init__()
+        if isinstance(data, str):
+            data = CSVTable(data)
+            if categories is None:
+                categories = data.columns
+        num_categories = data.shape[1]
+        if categories is None:
+            categories = [str(i) for i in range(num_categories)]
+        if len(categories) != num_categories:
+            raise ValueError(f"The length of categories ({len(categories)}) must be equal to the number of columns of data ({num_categories})")
+
+        if isinstance(colors, str) and colors.lower() == "auto":
+            colors = np.random.default_rng().integers(0, 256, (num_categories, 3))
+        colors = np.asarray(colors, dtype=np.int64)
+        if colors.shape[1] == 3:
+            colors = np.column_stack([colors, np.full(num_categories, 255)])
+
+        self.loc = VectorProp(2, IntProp, loc)
+        self.size = VectorProp(2, IntProp, size)
+        self.data = data
+        self.categories = list(categories)
+        self.frames_per_row = frames_per_row
+        self.top = top
+        self.colors = colors
+        self.text_color = VectorProp(4, IntProp, text_color)
+        self.font_size = IntProp(font_size)
+        self.row_labels = row_labels
+
+    def get_ranks(self, row: np.ndarray) -> np.ndarray:
+        """
+        Returns the indices of the top categories of a row, sorted by decreasing value.
+        Meant for internal use.
+        """
+        top = min(self.top, len(row))
+        indices = np.argpartition(-row, top-1)[:top]
+        return indices[np.argsort(-row[indices], kind="stable")]
+
+    def get_bars(self, frame: float) -> Tuple[np.ndarray]:
+        """
+        Returns (categories, values, positions) of the bars shown at frame.
+        Positions are ranks (0 is the top bar) interpolated between rows, so bars slide to their new rank.
+        :param frame: Frame to get bars.
+        """
+        time = min(max(frame / self.frames_per_row, 0), len(self.data)-1)
+        index = min(int(time), len(self.data)-2) if len(self.data) > 1 else 0
+        fac = time - index
+        row1 = np.nan_to_num(np.asarray(self.data[index], dtype=np.float64))
+        row2 = np.nan_to_num(np.asarray(self.data[min(index+1, len(self.data)-1)], dtype=np.float64))
+
+        # Categories outside the top of a row are placed just below the last bar.
+        top1, top2 = self.get_ranks(row1), self.get_ranks(row2)
+        categories = np.union1d(top1, top2)
+        rank1 = np.full(len(categories), self.top, dtype=np.float64)
+        rank2 = rank1.copy()
+        rank1[np.searchsorted(categories, top1)] = np.arange(len(top1))
+        rank2[np.searchsorted(categories, top2)] = np.arange(len(top2))
+
+        values = row1[categories] + fac*(row2[categories]-row1[categories])
+        positions = rank1 + fac*(rank2-rank1)
+        order = np.argsort(positions, kind="stable")
+        return categories[order], values[order], positions[order]
+
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        loc = self.loc(frame)
+        width, height = self.size(frame)
+        text_color = self.text_color(frame)
+        font_size = self.font_size(frame)
+        surf = pygame.Surface((max(width, 0), max(height, 0)), pygame.SRCALPHA)
+
+        categories, values, positions = self.get_bars(frame)
+        label_width = width // 5
+        bar_space = height / self.top
+        bar_height = int(bar_space * 0.8)
+        max_value = max(values.max(), 1e-9) if len(values) else 1
+        value_width = width - label_width - 10 - 4*font_size
+
+        for category, value, position in zip(categories.tolist(), values.tolist(), positions.tolist()):
+            if position >= self.top:
+                continue
+            y = int(position * bar_space + (bar_space-bar_height) / 2)
+            bar_width = max(int(value / max_value * value_width), 0)
+            pygame.draw.rect(surf, self.colors[category].tolist(), (label_width, y, bar_width, bar_height))
+
+            # Label surfaces are cached by render_text.
+            label = render_text(self.categories[category], get_font(), font_size, text_color)
+            surf.blit(label, (label_width - 10 - label.get_width(), y + (bar_height-label.get_height()) // 2))
+            label = render_text(f"{value:,.0f}", get_font(), font_size, text_color)
+            surf.blit(label, (label_width + bar_width + 10, y + (bar_height-label.get_height()) // 2))
+
+        if self.row_labels is not None:
+            row = min(max(round(frame / self.frames_per_row), 0), len(self.row_labels)-1)
+            label = render_text(str(self.row_labels[row]), get_font(), 2*font_size, text_color)
+            surf.blit(label, (width - 10 - label.get_width(), height - 10 - label.get_height()))
+
+        return surf, loc
+
+
+class LineChart(BaseElement):
+    """
+    Line or area chart of a series of values, e.g. a time series with millions of points.
+    A pyramid of the minimum and maximum of blocks of 2, 4, 8... values is computed once,
+    and each frame only reads the few blocks that exactly cover each pixel column of the visible range,
+    so animating the visible range (e.g. revealing or panning) costs the same for any length of series.
+    """
+
+    pixel_props = ("loc", "size", "width")
+
+    loc: VectorProp
+    size: VectorProp
+    start: FloatProp
+    end: FloatProp
+    color: VectorProp
+    fill_color: VectorProp
+    width: IntProp
+    antialias: BoolProp
+    y_range: Tuple[float]
+    auto_scale: bool
+    levels: List[Tuple[np.ndarray]]
+
+    def __init__(self, loc: Tuple[int] = (0, 0), size: Tuple[int] = (1600, 900), data: Any = (0, 1), start: float = 0,
+            end: float = None, color: Tuple[int] = (255, 255, 255), fill_color: Tuple[int] = None, width: int = 2,
+            antialias: bool = True, y_range: Tuple[float] = None, auto_scale: bool = False) -> None:
+        """
+        Initializes line chart.
+        :param loc: Top left corner location (pixels) of chart.
+        :param size: Size (x, y) pixels of chart.
+        :param data: Array of values, which are evenly spaced along the x axis. NaN values are skipped.
+        :param start: Index (may be fractional) of the first value shown at the left edge.
+        :param end: Index of the last value shown at the right edge. Uses the last value if None.
+            Animate end for a reveal, or start and end for a pan.
+        :param color: Color (rgba, 0 to 255) of line.
+        :param fill_color: Color of the area below the line. The area isn't drawn if None.
+        :param width: Width (pixels) of line. Set to 0 to only draw the area.
+        :param antialias: Whether to antialias lines with a width of 1.
+        :param y_range: (minimum, maximum) value at the bottom and top edges. Uses the minimum and maximum of data if None.
+        :param auto_scale: Whether the y range fits the visible values each frame instead. Ignores y_range.
+        """
+        super().__init__()
+        data = np.asarray(data, dtype=np.float64).reshape(-1)
+        if len(data) < 2:
+            raise ValueError(f"Data must have at least 2 values, got {len(data)}.")
+
+        color = get_color(color)
+        if len(color) == 3:
+            color = (*color, 255)
+        self.loc = VectorProp(2, IntProp, loc)
+        self.size = VectorProp(2, IntProp, size)
+        self.start = FloatProp(start)
+        self.end = FloatProp(len(data)-1 if end is None else end)
+        self.color = VectorProp(4, IntProp, color)
+        self.fill_color = None
+        if fill_color is not None:
+            fill_color = get_color(fill_color)
+            self.fill_color = VectorProp(4, IntProp, (*fill_color, 255) if len(fill_color) == 3 else fill_color)
+        self.width = IntProp(width)
+        self.antialias = BoolProp(antialias)
+        self.auto_scale = auto_scale
+
+        self.levels = self.build_levels(data)
+        top_min, top_max = self.levels[-1]
+        self.y_range = (top_min[0], top_max[0]) if y_range is None else tuple(y_range)
+
+    @staticmethod
+    def build_levels(data: np.ndarray) -> List[Tuple[np.ndarray]]:
+        """
+        Returns the (minimums, maximums) of blocks of 1, 2, 4... values, until one block covers all values.
+        Meant for internal use.
+        """
+        levels = [(data, data)]
+        mins, maxs = data, data
+        while len(mins) > 1:
+            even = len(mins) // 2 * 2
+            next_mins = np.fmin(mins[0:even:2], mins[1:even:2])
+            next_maxs = np.fmax(maxs[0:even:2], maxs[1:even:2])
+            if even < len(mins):
+                next_mins = np.append(next_mins, mins[-1])
+                next_maxs = np.append(next_maxs, maxs[-1])
+            mins, maxs = next_mins, next_maxs
+            levels.append((mins, maxs))
+        return levels
+
+    def get_columns(self, start: float, end: float, columns: int) -> Tuple[np.ndarray]:
+        """
+        Returns (x, minimums, maximums) of the values in each pixel column between start and end.
+        If there are fewer than 2 values per column, the values themselves are returned as both minimums and maximums.
+        :param start: Index of the value at the left edge.
+        :param end: Index of the value at the right edge.
+        :param columns: Number of pixel columns.
+        """
+        data = self.levels[0][0]
+        per_column = (end-start) / columns
+        if per_column < 2:
+            first = max(int(np.floor(start)), 0)
+            last = min(int(np.ceil(end)) + 1, len(data))
+            values = data[first:last]
+            x = (np.arange(first, last)-start) / per_column
+            return x, values, values
+
+        edges = np.floor(start + np.arange(columns+1) * per_column).astype(np.int64)
+        first = np.clip(edges[:-1], 0, len(data)-1)
+        last = np.clip(np.maximum(edges[1:], first+1), 1, len(data))
+        col_mins, col_maxs = self.query(first, last)
+        return np.arange(columns) + 0.5, col_mins, col_maxs
+
+    def query(self, first: np.ndarray, last: np.ndarray) -> Tuple[np.ndarray]:
+        """
+        Returns the minimum and maximum of the values from each index in first to the index in last (exclusive).
+        Each range is covered by at most 2 blocks of each level, so this reads O(log(length of data)) values per range.
+        Meant for internal use.
+        """
+        mins = np.full(len(first), np.nan)
+        maxs = np.full(len(first), np.nan)
+        first, last = first.copy(), last.copy()
+        for level_mins, level_maxs in self.levels:
+            # Blocks sticking out on either side are used now, the rest is covered by larger blocks.
+            take = (first < last) & (first % 2 == 1)
+            mins[take] = np.fmin(mins[take], level_mins[first[take]])
+            maxs[take] = np.fmax(maxs[take], level_maxs[first[take]])
+            first += take
+            take = (first < last) & (last % 2 == 1)
+            last -= take
+            mins[take] = np.fmin(mins[take], level_mins[last[take]])
+            maxs[take] = np.fmax(maxs[take], level_maxs[last[take]])
+            first //= 2
+            last //= 2
+            if not (first < last).any():
+                break
+        return mins, maxs
+
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        loc = self.loc(frame)
+        width, height = [max(s, 1) for s in self.size(frame)]
+        start, end = self.start(frame), self.end(frame)
+        line_width = self.width(frame)
+        surf = pygame.Surface((width, height), pygame.SRCALPHA)
+        if end <= start:
+            return surf, loc
+
+        x, mins, maxs = self.get_columns(start, end, width)
+        valid = ~(np.isnan(mins) | np.isnan(maxs))
+        x, mins, maxs = x[valid], mins[valid], maxs[valid]
+        if len(x) < 2:
+            return surf, loc
+
+        low, high = (mins.min(), maxs.max()) if self.auto_scale else self.y_range
+        scale = (height-1) / (high-low) if high > low else 0
+        y_mins = (height-1) - (mins-low)*scale
+        y_maxs = (height-1) - (maxs-low)*scale
+
+        if self.fill_color is not None:
+            points = np.column_stack([x, y_maxs]).tolist()
+            pygame.draw.polygon(surf, self.fill_color(frame), [(x[0], height)] + points + [(x[-1], height)])
+
+        if line_width > 0:
+            # Zigzag between the minimum and maximum of each column, which draws the whole range of values in it.
+            points = np.column_stack([np.repeat(x, 2), np.column_stack([y_mins, y_maxs]).reshape(-1)]).tolist()
+            if line_width == 1 and self.antialias(frame):
+                pygame.draw.aalines(surf, self.color(frame), False, points)
+            else:
+                pygame.draw.lines(surf, self.color(frame), False, points, line_width)
+
+        return surf, loc
@@ -18,26 +18,27 @@
 #
 
 import os
-import time
-import shutil
-from typing import Tuple
-from math import atan, cos, degrees, radians, sin, sqrt, tan
-from hashlib import sha256
-import atexit
+from typing import List, Tuple
+from math import atan, ceil, cos, degrees, radians, sin, sqrt, tan
+import numpy as np
 import pygame
 from pygame import gfxdraw
-import cv2
 from . import BaseElement
 from ..options import *
 from ..props import *
 from ..utils import *
 from ..printer import printer
+from ..fonts import load_font, render_text
+from ..images import load_image, scale_image
+from ..video import FrameStore, VideoDecoder
 pygame.init()
 
 
 class Rect(BaseElement):
     """Rectangle element."""
 
+    pixel_props = ("loc", "size", "border")
+
     loc: VectorProp
     size: VectorProp
     border: IntProp
@@ -71,29 +72,35 @@ class Rect(BaseElement):
         self.border_color = VectorProp(4, IntProp, border_color)
         self.antialias = BoolProp(antialias)
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
-        size = self.size(frame)
+        size = [max(s, 0) for s in self.size(frame)]
         border = self.border(frame)
         color = self.color(frame)
         border_color = self.border_color(frame)
         antialias = self.antialias(frame)
 
+        (ox, oy), bbox_size = clip_bbox(loc, size, res)
+        if bbox_size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+        rect = [loc[0]-ox, loc[1]-oy]+size
+
+        surface = pygame.Surface(bbox_size, pygame.SRCALPHA)
         if antialias:
-            surface.fill(color, loc+size)
+            surface.fill(color, rect)
         else:
-            pygame.draw.rect(surface, color, loc+size)
+            pygame.draw.rect(surface, color, rect)
         if border > 0:
-            pygame.draw.rect(surface, border_color, loc+size, border)
+            pygame.draw.rect(surface, border_color, rect, border)
 
-        return surface
+        return surface, (ox, oy)
 
 
 class Circle(BaseElement):
     """Circle element."""
 
+    pixel_props = ("loc", "radius", "border")
+
     loc: VectorProp
     radius: IntProp
     border: IntProp
@@ -127,30 +134,37 @@ class Circle(BaseElement):
         self.border_color = VectorProp(4, IntProp, border_color)
         self.antialias = BoolProp(antialias)
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
-        radius = self.radius(frame)
+        radius = max(self.radius(frame), 0)
         border = self.border(frame)
         color = self.color(frame)
         border_color = self.border_color(frame)
         antialias = self.antialias(frame)
 
+        # One pixel of padding for antialiasing.
+        (ox, oy), size = clip_bbox((loc[0]-radius-1, loc[1]-radius-1), (2*radius+3, 2*radius+3), res)
+        if size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+        center = (loc[0]-ox, loc[1]-oy)
+
+        surface = pygame.Surface(size, pygame.SRCALPHA)
         if antialias:
-            gfxdraw.aacircle(surface, *loc, radius, color)
-            gfxdraw.filled_circle(surface, *loc, radius, color)
+            gfxdraw.aacircle(surface, *center, radius, color)
+            gfxdraw.filled_circle(surface, *center, radius, color)
         else:
-            pygame.draw.circle(surface, color, loc, radius)
+            pygame.draw.circle(surface, color, center, radius)
         if border > 0:
-            pygame.draw.circle(surface, border_color, loc, radius, border)
+            pygame.draw.circle(surface, border_color, center, radius, border)
 
-        return surface
+        return surface, (ox, oy)
 
 
 class Ellipse(BaseElement):
     """Ellipse element."""
 
+    pixel_props = ("loc", "size", "border")
+
     loc: VectorProp
     size: VectorProp
     color: VectorProp
@@ -184,31 +198,41 @@ class Ellipse(BaseElement):
         self.border_color = VectorProp(4, IntProp, border_color)
         self.antialias = BoolProp(antialias)
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
-        size = self.size(frame)
+        size = [max(s, 0) for s in self.size(frame)]
         color = self.color(frame)
         border = self.border(frame)
         border_color = self.border_color(frame)
         antialias = self.antialias(frame)
 
+        # Antialiased ellipses use loc as the center and size as the radii.
+        bbox = pygame.Rect(loc, size)
+        if antialias:
+            bbox.union_ip((loc[0]-size[0]-1, loc[1]-size[1]-1, 2*size[0]+3, 2*size[1]+3))
+        (ox, oy), bbox_size = clip_bbox(bbox.topleft, bbox.size, res)
+        if bbox_size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+        rect = (loc[0]-ox, loc[1]-oy, *size)
+
+        surface = pygame.Surface(bbox_size, pygame.SRCALPHA)
         if antialias:
-            gfxdraw.aaellipse(surface, *loc, *size, color)
-            gfxdraw.filled_ellipse(surface, *loc, *size, color)
+            gfxdraw.aaellipse(surface, loc[0]-ox, loc[1]-oy, *size, color)
+            gfxdraw.filled_ellipse(surface, loc[0]-ox, loc[1]-oy, *size, color)
         else:
-            pygame.draw.ellipse(surface, color, loc+size)
+            pygame.draw.ellipse(surface, color, rect)
         if border > 0:
-            pygame.draw.ellipse(surface, border_color, loc+size, border)
+            pygame.draw.ellipse(surface, border_color, rect, border)
 
-        return surface
+        return surface, (ox, oy)
 
 
 class Polygon(BaseElement):
     """Polygon element."""
 
-    verts: Tuple[VectorProp]
+    pixel_props = ("verts", "offset", "border")
+
+    verts: ArrayProp
     border: IntProp
     color: VectorProp
     border_color: VectorProp
@@ -220,6 +244,8 @@ class Polygon(BaseElement):
         """
         Initializes polygon.
         :param verts: List of verts of polygon in the form ((x1, y1), (x2, y2), (x3, y3), ...).
+            All verts are one ArrayProp, so keyframe them with polygon.verts.keyframe(verts, frame),
+            or one vert with polygon.verts.keyframe((x, y), frame, index=i).
         :param border: Border of polygon (pixels).
         :param color: Color (rgba, 0 to 255) of polygon. The ALPHA will be set to 255 if no alpha is given.
         :param border_color: Color of polygon border.
@@ -234,23 +260,46 @@ class Polygon(BaseElement):
         if len(border_color) == 3:
             border_color = (*border_color, 255)
 
-        self.verts = [VectorProp(2, IntProp, vert) for vert in verts]
+        self.verts = ArrayProp((len(verts), 2), int, verts)
         self.border = IntProp(border)
         self.color = VectorProp(4, IntProp, color)
         self.border_color = VectorProp(4, IntProp, border_color)
         self.offset = VectorProp(2, IntProp, offset)
         self.antialias = BoolProp(antialias)
+        self._outline = None
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def get_outline(self, verts: np.ndarray, offset: Tuple[int], border: int,
+            res: Tuple[int]) -> Tuple[Tuple[int], Tuple[int], List[Tuple[int]]]:
+        """
+        Returns the location and size of the polygon's bounding box clipped to the frame, and its verts relative to it.
+        The last outline is reused while the verts, offset, border and resolution don't change.
+        Meant for internal use.
+        :param verts: Verts of polygon, shape (n, 2).
+        :param offset: Offset of all verts.
+        :param border: Border of polygon, which is drawn on both sides of the edges.
+        :param res: Resolution of the frame.
+        """
+        key = (verts.tobytes(), tuple(offset), border, tuple(res))
+        if self._outline is None or self._outline[0] != key:
+            verts = verts + offset
+            pad = max(border, 1)
+            loc = verts.min(axis=0) - pad
+            size = verts.max(axis=0) - loc + pad + 1
+            loc, size = clip_bbox(loc.tolist(), size.tolist(), res)
+            self._outline = (key, loc, size, [tuple(v) for v in (verts-loc).tolist()])
+        return self._outline[1:]
+
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         border = self.border(frame)
         color = self.color(frame)
         border_color = self.border_color(frame)
         offset = self.offset(frame)
         antialias = self.antialias(frame)
-        verts = [(vx + offset[0], vy + offset[1]) for v in self.verts for vx, vy in v(frame)]
+        loc, size, verts = self.get_outline(self.verts(frame), offset, border, res)
+        if size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
 
+        surface = pygame.Surface(size, pygame.SRCALPHA)
         if antialias:
             gfxdraw.aapolygon(surface, verts, color)
             gfxdraw.filled_polygon(surface, verts, color)
@@ -259,12 +308,14 @@ class Polygon(BaseElement):
         if border > 0:
             pygame.draw.polygon(surface, border_color, verts, border)
 
-        return surface
+        return surface, loc
 
 
 class Line(BaseElement):
     """Line element."""
 
+    pixel_props = ("loc1", "loc2", "thickness")
+
     loc1: VectorProp
     loc2: VectorProp
     thickness: IntProp
@@ -309,26 +360,38 @@ class Line(BaseElement):
         loc2 = (loc1[0] + x_off, loc1[1] + y_off)
         return cls(loc1, loc2, thickness, color)
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc1 = self.loc1(frame)
         loc2 = self.loc2(frame)
         thickness = self.thickness(frame)
         color = self.color(frame)
         antialias = self.antialias(frame)
 
+        pad = max(thickness, 1)
+        ox = min(loc1[0], loc2[0]) - pad
+        oy = min(loc1[1], loc2[1]) - pad
+        width = abs(loc1[0]-loc2[0]) + 2*pad + 1
+        height = abs(loc1[1]-loc2[1]) + 2*pad + 1
+        (ox, oy), size = clip_bbox((ox, oy), (width, height), res)
+        if size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+        loc1 = (loc1[0]-ox, loc1[1]-oy)
+        loc2 = (loc2[0]-ox, loc2[1]-oy)
+
+        surface = pygame.Surface(size, pygame.SRCALPHA)
         if antialias:
             gfxdraw.line(surface, *loc1, *loc2, color)
         else:
             pygame.draw.line(surface, color, loc1, loc2, thickness)
 
-        return surface
+        return surface, (ox, oy)
 
 
 class Arc(BaseElement):
     """Arc element."""
 
+    pixel_props = ("loc", "size", "border")
+
     loc: VectorProp
     size: VectorProp
     start_angle: FloatProp
@@ -363,25 +426,31 @@ class Arc(BaseElement):
         self.color = VectorProp(4, IntProp, color)
         self.antialias = BoolProp(antialias)
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
-        size = self.size(frame)
+        size = [max(s, 0) for s in self.size(frame)]
         start_angle = self.start_angle(frame)
         stop_angle = self.stop_angle(frame)
         border = self.border(frame)
         color = self.color(frame)
         antialias = self.antialias(frame)
 
-        pygame.draw.arc(surface, color, loc+size, start_angle, stop_angle, border)
+        # pygame may draw one pixel outside of the rect.
+        (ox, oy), bbox_size = clip_bbox((loc[0]-1, loc[1]-1), (size[0]+2, size[1]+2), res)
+        if bbox_size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+
+        surface = pygame.Surface(bbox_size, pygame.SRCALPHA)
+        pygame.draw.arc(surface, color, [loc[0]-ox, loc[1]-oy]+size, start_angle, stop_angle, border)
 
-        return surface
+        return surface, (ox, oy)
 
 
 class Arrow(BaseElement):
     """Arrow pointer element."""
 
+    pixel_props = ("loc1", "loc2", "stem_width", "head_width", "head_length")
+
     loc1: VectorProp
     loc2: VectorProp
     stem_width: IntProp
@@ -407,6 +476,7 @@ class Arrow(BaseElement):
         self.head_width = IntProp(head_width)
         self.head_length = IntProp(head_length)
         self.color = VectorProp(4, IntProp, color)
+        self._outline = None
 
     @classmethod
     def from_vector(cls, origin: Tuple[int] = (0, 0), angle: float = 0, magnitude: float = 100, stem_width: int = 20,
@@ -447,8 +517,9 @@ class Arrow(BaseElement):
         if (dx := x2 - x1) == 0:
             angle = 90 if y2-y1 > 0 else -90
         else:
+            # atan only covers directions to the right, so directions to the left are turned around.
             angle = degrees(atan((y2-y1)/dx))
-            if angle < 0:
+            if dx < 0:
                 angle += 180
 
         p1 = Arrow.walk(loc1, angle+90, stem_width//2)
@@ -461,9 +532,29 @@ class Arrow(BaseElement):
 
         return [p1, p2, p3, p4, p5, p6, p7]
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
-
+    def get_outline(self, loc1: Tuple[int], loc2: Tuple[int], stem_width: int, head_width: int, head_length: int,
+            res: Tuple[int]) -> Tuple[Tuple[int], Tuple[int], List[List[float]]]:
+        """
+        Returns the location and size of the arrow's bounding box clipped to the frame, and its verts relative to it.
+        The last outline is reused while the locations, widths and resolution don't change.
+        Meant for internal use.
+        :param loc1: The origin of arrow.
+        :param loc2: The end point of arrow.
+        :param stem_width: The width of the base of arrow.
+        :param head_width: The width of the top of arrow.
+        :param head_length: The length of the top of arrow.
+        :param res: Resolution of the frame.
+        """
+        key = (tuple(loc1), tuple(loc2), stem_width, head_width, head_length, tuple(res))
+        if self._outline is None or self._outline[0] != key:
+            verts = np.array(Arrow.get_verts(loc1, loc2, stem_width, head_width, head_length), dtype=float)
+            loc = verts.min(axis=0).astype(int) - 1
+            size = verts.max(axis=0).astype(int) - loc + 2
+            loc, size = clip_bbox(loc.tolist(), size.tolist(), res)
+            self._outline = (key, loc, size, (verts-loc).tolist())
+        return self._outline[1:]
+
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc1 = self.loc1(frame)
         loc2 = self.loc2(frame)
         stem_width = self.stem_width(frame)
@@ -471,15 +562,21 @@ class Arrow(BaseElement):
         head_length = self.head_length(frame)
         color = self.color(frame)
 
-        verts = Arrow.get_verts(loc1, loc2, stem_width, head_width, head_length)
+        loc, size, verts = self.get_outline(loc1, loc2, stem_width, head_width, head_length, res)
+        if size == (0, 0):
+            return pygame.Surface((0, 0), pygame.SRCALPHA), (0, 0)
+
+        surface = pygame.Surface(size, pygame.SRCALPHA)
         pygame.draw.polygon(surface, color, verts)
 
-        return surface
+        return surface, loc
 
 
 class Text(BaseElement):
     """Text element."""
 
+    pixel_props = ("loc",)
+
     loc: VectorProp
     color: VectorProp
     font: StringProp
@@ -517,99 +614,81 @@ class Text(BaseElement):
         self.antialias = BoolProp(antialias)
 
     def get_font(self, frame):
-        font_family = self.font(frame)
-        font_size = self.size(frame)
-
-        if os.path.isfile(font_family):
-            return pygame.font.Font(font_family, font_size)
-        else:
-            bold = self.bold(frame)
-            italic = self.italic(frame)
-            return pygame.font.SysFont(font_family, font_size, bold, italic)
+        return load_font(self.font(frame), self.size(frame), self.bold(frame), self.italic(frame))
 
     def get_size(self, frame: int = 0) -> Tuple[int]:
-        font_family = self.font(frame)
-        text_str = self.text(frame)
-        size = self.size(frame)
-
-        font = pygame.font.SysFont(font_family, size)
-        text = font.render(text_str, True, (0, 0, 0))
-
-        return text.get_size()
+        return self.render_text(frame).get_size()
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
+    def render_text(self, frame: int) -> pygame.Surface:
+        """
+        Returns the rendered text, which is shared with other text elements and must not be changed.
+        :param frame: Frame to render.
+        """
+        return render_text(self.text(frame), self.font(frame), self.size(frame), self.color(frame),
+            self.antialias(frame), self.bold(frame), self.italic(frame))
 
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
-        color = self.color(frame)
-        text_str = self.text(frame)
-        antialias = self.antialias(frame)
-
-        font = self.get_font(frame)
-        text = font.render(text_str, antialias, color)
+        text = self.render_text(frame)
         loc = [loc[i] - text.get_size()[i]//2 for i in range(2)]
-        surface.blit(text, loc)
 
-        return surface
+        return text, loc
 
 
 class Image(BaseElement):
-    """Image element."""
+    """
+    Image element.
+    Loaded and scaled images are shared by all elements, see graphics.images.
+    """
+
+    pixel_props = ("loc", "size")
 
     loc: VectorProp
     size: VectorProp
     src: StringProp
+    filter: str
 
-    def __init__(self, loc: Tuple[int] = (0, 0), size: Tuple[int] = (1920, 1080), src: str = ""):
+    def __init__(self, loc: Tuple[int] = (0, 0), size: Tuple[int] = (1920, 1080), src: str = "", filter: str = "nearest"):
         """
         Initializes image.
         :param loc: Location of top left corner of image.
         :param size: Size (x, y) of image.
         :param src: Source path of image.
+        :param filter: Filter used to scale the image, "nearest" or "smooth".
         """
         super().__init__()
         self.loc = VectorProp(2, IntProp, loc)
         self.size = VectorProp(2, IntProp, size)
         self.src = StringProp(src)
-
-        self.last_src = None
-        self.last_img = None
+        self.filter = filter
 
     def get_image(self, frame):
-        src = self.src(frame)
-        if src == self.last_src:
-            return self.last_img
-
-        image = pygame.image.load(src)
-        self.last_src = src
-        self.last_img = image
-
-        return image
-
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
+        return load_image(self.src(frame))
 
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
         size = self.size(frame)
 
-        image = self.get_image(frame)
-        image = pygame.transform.scale(image, size)
-        surface.blit(image, loc)
+        image = scale_image(self.src(frame), size, self.filter)
 
-        return surface
+        return image, loc
 
 
 class Video(BaseElement):
-    """Video element."""
+    """
+    Video element.
+    Frames are decoded ahead of the frame being rendered by a VideoDecoder, see graphics.video.
+    """
+
+    cacheable = False
 
     loc: VectorProp
     size: VectorProp
     speed: float
     offset: float
     src: str
-    video: Any
-    last_frame: int
-    last_img: pygame.Surface
+    decoder: VideoDecoder
+    max_frame: int
 
     def __init__(self, loc: Tuple[int] = (0, 0), size: Tuple[int] = (1920, 1080), src: str = "", speed: float = 1, offset: float = 0):
         """
@@ -627,63 +706,40 @@ class Video(BaseElement):
         self.offset = offset
         self.src = src
 
-        self.video_reset()
-        self.max_frame = 0
-        while True:
-            img = self.video_next()
-            if img is None:
-                break
-            self.max_frame += 1
-
-        self.video_reset()
-
-    def video_reset(self):
-        self.video = cv2.VideoCapture(self.src)
-        self.last_frame = -1
-        self.last_img = None
-
-    def video_next(self):
-        if self.last_frame >= self.max_frame:
-            return None
-
-        success, img = self.video.read()
-        if success:
-            self.last_img = cv2img2surf(img)
-            self.last_frame += 1
-            return img
-        return None
-
-    def get_surf(self, frame):
-        if self.last_frame > frame:
-            self.video_reset()
-
-        while self.last_frame < frame:
-            result = self.video_next()
-            if result is None:
-                # means end of video.
-                return pygame.Surface((100, 100), pygame.SRCALPHA)
-
-        return (pygame.Surface((100, 100), pygame.SRCALPHA) if self.last_img is None else self.last_img)
+        self.decoder = VideoDecoder(src)
+        self.max_frame = self.decoder.length
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
+    def get_video_frame(self, frame: float) -> int:
+        """
+        Returns the frame of the video shown at frame.
+        :param frame: Frame of the element.
+        """
+        return ceil(frame*self.speed - self.offset)
 
-        loc = self.loc(frame)
-        size = self.size(frame)
-        surf = self.get_surf(frame*self.speed-self.offset)
+    def get_size(self, frame: float) -> Tuple[int]:
+        return tuple(max(int(x), 1) for x in self.size(frame))
 
-        surf = pygame.transform.scale(surf, size)
-        surface.blit(surf, loc)
+    def get_surf(self, frame: int) -> pygame.Surface:
+        size = self.get_size(frame)
+        rgb = self.decoder.get(self.get_video_frame(frame), size)
+        if rgb is None:
+            # Before the start or after the end of the video.
+            return pygame.Surface(size, pygame.SRCALPHA)
+        return pygame.image.frombuffer(rgb, size, "RGB")
 
-        return surface
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        return self.get_surf(frame), self.loc(frame)
 
 
 class NewVideo(BaseElement):
     """
     Improved video element.
+    Decoded frames are stored on disk by a FrameStore (see graphics.video) and reused by later runs.
     todo change class name after testing
     """
 
+    cacheable = False
+
     loc: VectorProp
     size: VectorProp
     src: str
@@ -691,6 +747,7 @@ class NewVideo(BaseElement):
     speed: float
     offset: float
     max_cache: int
+    store: FrameStore
 
     def __init__(self, loc: Tuple[int] = (0, 0), size: Tuple[int] = (1920, 1080), src: str = "", speed: float = 1,
             offset: float = 0, max_cache: int = 0, cache_verbose: bool = True) -> None:
@@ -703,55 +760,35 @@ class NewVideo(BaseElement):
         self.offset = offset
         self.max_cache = max_cache
 
-        self.cache(cache_verbose)
+        self.cache(size, cache_verbose)
 
     def rm_cache(self):
-        if self.cache_path.startswith(get_parent()):
-            shutil.rmtree(self.cache_path)
-
-    def cache(self, verbose):
-        base_dir = os.path.join(get_parent(), ".videocache")
-        get_path = lambda: os.path.join(base_dir, sha256(str(time.time()).encode()).hexdigest()[:20])
-        path = get_path()
-        while os.path.isdir(path):
-            path = get_path()
-
-        self.cache_path = path
-        os.makedirs(self.cache_path)
-        atexit.register(self.rm_cache)
-
-        video = cv2.VideoCapture(self.src)
-        self.length = 0
-        while self.max_cache == 0 or self.length < self.max_cache:
-            if verbose:
-                printer.clearline()
-                printer.write(f"[GRAPHICS] Video cache: {os.path.basename(self.src)}: Frame {self.length}")
-            rval, frame = video.read()
-            if not rval:
-                break
-
-            path = os.path.join(self.cache_path, f"{self.length}.png")
-            cv2.imwrite(path, frame)
-            self.length += 1
-
-        printer.clearline()
-        printer.write(f"[GRAPHICS] Video cache: {os.path.basename(self.src)}: Finished, {self.length} frames")
-        printer.newline()
+        self.store.remove()
 
-    def get_frame(self, frame):
-        path = os.path.join(self.cache_path, f"{frame}.png")
-        surf = pygame.image.load(path)
-        return surf
+    def cache(self, size, verbose):
+        self.store = FrameStore(self.src, size)
+        self.length = self.store.length
+        if self.max_cache > 0:
+            self.length = min(self.length, self.max_cache)
 
-    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
-        surface = pygame.Surface(res, pygame.SRCALPHA)
+        if verbose:
+            printer.clearline()
+            printer.write(f"[GRAPHICS] Video cache: {os.path.basename(self.src)}: {self.store.num_stored()} of {self.length} frames stored")
+            printer.newline()
+
+    def get_frame(self, frame):
+        rgb = self.store.get(frame) if 0 <= frame < self.length else None
+        if rgb is None:
+            return pygame.Surface(self.store.size, pygame.SRCALPHA)
+        return pygame.image.frombuffer(rgb, self.store.size, "RGB")
 
+    def render_raw_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
         loc = self.loc(frame)
         size = self.size(frame)
         video_frame = int(frame*self.speed + self.offset)
 
         image = self.get_frame(video_frame)
-        image = pygame.transform.scale(image, size)
-        surface.blit(image, loc)
+        if image.get_size() != tuple(size):
+            image = pygame.transform.scale(image, size)
 
-        return surface
+        return image, loc
@@ -23,27 +23,194 @@ import shutil
 import time
 import subprocess
 import multiprocessing
-from typing import Tuple
-from hashlib import sha256
+import threading
+import queue
+import json
+import pickle
+import traceback
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Tuple
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+from hashlib import blake2b, sha256
+import numpy as np
 import pygame
 import cv2
+from . import options
+from .props import *
+from .cache import LRUCache, StaticCache
 from .scene import Scene
+from .modifiers import output_stats
 from .printer import printer
 from .utils import *
 
+# Options that only change speed or memory use, not the rendered frames, so they are left out of segment hashes.
+PERFORMANCE_OPTIONS = ("MB_CACHE", "EXPORT_QUEUE", "EXPORT_SEGMENT", "MODIFIER_CACHE", "FONT_CACHE", "TEXT_CACHE",
+    "FONT_INDEX", "IMAGE_CACHE", "SPRITE_CACHE", "VIDEO_BUFFER", "VIDEO_SEEK", "CACHE_DIR")
 
-def get_tmp_path():
-    get_path = lambda: os.path.join(get_parent(), ".mcexport", sha256(str(time.time()).encode()).hexdigest()[:16])
-    path = get_path()
-    while os.path.isdir(path):
-        path = get_path()
 
-    return path
+def surf_to_bgr(surface: pygame.Surface) -> np.ndarray:
+    """
+    Converts a surface to a BGR image of shape (height, width, 3) for OpenCV.
+    Reads the surface pixels directly, without rotating or flipping the surface.
+    :param surface: Surface to convert.
+    """
+    pixels = pygame.surfarray.pixels3d(surface)
+    image = np.ascontiguousarray(pixels.transpose(1, 0, 2)[..., ::-1])
+    del pixels
+    return image
+
+
+class ExportStage:
+    """
+    One stage of a pipelined export, which processes frames in its own thread.
+    Frames are passed between stages through bounded queues, so a slow stage makes the others wait.
+    """
+
+    name: str
+    count: int
+    busy: float
+    error: BaseException
+
+    # Sent through the queues after the last frame.
+    STOP = object()
+
+    def __init__(self, name: str, func: Callable[[Any], Any], queue_size: int) -> None:
+        """
+        Initializes stage.
+        :param name: Name shown in stats.
+        :param func: Function that processes one frame and returns the result for the next stage.
+        :param queue_size: Maximum number of frames waiting for this stage.
+        """
+        self.name = name
+        self.func = func
+        self.count = 0
+        self.busy = 0
+        self.error = None
+        self.input = queue.Queue(queue_size)
+        self.output = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        while True:
+            item = self.input.get()
+            if item is ExportStage.STOP:
+                break
+            if self.error is not None:
+                # Keep consuming, so previous stages never block on a failed stage.
+                continue
+
+            try:
+                start = time.time()
+                result = self.func(item)
+                self.busy += time.time() - start
+                self.count += 1
+            except BaseException as error:
+                self.error = error
+                continue
+            if self.output is not None:
+                self.output.put(result)
+
+        if self.output is not None:
+            self.output.put(ExportStage.STOP)
+
+
+def export_pipelined(resolution: Tuple[int], scenes: Tuple[Scene], write: Callable[[np.ndarray], None],
+        verbose: bool = True, frames: Tuple[Tuple[int]] = None) -> int:
+    """
+    Renders all frames of scenes and passes each one as a BGR image to write.
+    Rendering happens on the calling thread, while conversion and writing run in their own threads.
+    Duplicate frames are not rendered, and the last image is written again.
+    Returns the number of duplicate frames.
+    Meant for internal use.
+    :param resolution: Resolution of video.
+    :param scenes: List of scenes to export in order of appearance.
+    :param write: Function that encodes one BGR image.
+    :param verbose: Whether to show information prints.
+    :param frames: Frames to render of each scene. Defaults to all frames. If given, scenes must already be baked.
+    """
+    last_image = None
+
+    def convert(surface):
+        nonlocal last_image
+        if surface is not None:
+            last_image = surf_to_bgr(surface)
+        return last_image
+
+    convert_stage = ExportStage("Convert", convert, get_export_queue())
+    encode_stage = ExportStage("Encode", write, get_export_queue())
+    convert_stage.output = encode_stage.input
+    stages = (convert_stage, encode_stage)
+    for stage in stages:
+        stage.thread.start()
+
+    render_count = 0
+    render_busy = 0
+    duplicates = 0
+    try:
+        for i, scene in enumerate(scenes):
+            if frames is None:
+                scene.bake()
+                scene_frames = scene.get_frames()
+            else:
+                scene_frames = frames[i]
+            if len(scene_frames) == 0:
+                continue
+            scene_num_frames = len(scene_frames)
+            total_frames = 1
+            time_start = time.time()
+            last_fingerprint = None
+            for frame in scene_frames:
+                if verbose:
+                    elapse = time.time() - time_start
+                    per_frame = elapse / total_frames
+                    remaining = per_frame * (scene_num_frames-total_frames)
+                    remaining = str(remaining)[:6]
+                    printer.clearline()
+                    printer.write(f"[GRAPHICS] Exporting: Scene {i+1}/{len(scenes)}: Frame {total_frames}/{scene_num_frames}, {remaining}s remaining.")
+                total_frames += 1
+
+                for stage in stages:
+                    if stage.error is not None:
+                        raise stage.error
+
+                fingerprint = scene.get_fingerprint(frame)
+                if fingerprint == last_fingerprint:
+                    # Same as the last frame, so the last image is written again.
+                    duplicates += 1
+                    surface = None
+                else:
+                    start = time.time()
+                    surface = scene.render(resolution, frame)
+                    render_busy += time.time() - start
+                    render_count += 1
+                    last_fingerprint = fingerprint
+                convert_stage.input.put(surface)
+
+            if verbose:
+                printer.newline()
+
+    finally:
+        convert_stage.input.put(ExportStage.STOP)
+        for stage in stages:
+            stage.thread.join()
+
+    for stage in stages:
+        if stage.error is not None:
+            raise stage.error
+
+    if verbose:
+        stats = [("Render", render_count, render_busy)] + [(s.name, s.count, s.busy) for s in stages]
+        for name, count, busy in stats:
+            fps = str(count / busy)[:6] if busy > 0 else "inf"
+            printer.write(f"[GRAPHICS] {name} stage: {count} frames, {str(busy)[:6]}s busy, {fps} frames per second.")
+            printer.newline()
+
+    return duplicates
 
 
 def export_sc(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], path: str, verbose: bool = True, notify: bool = True) -> None:
     """
-    Single core export.
+    Single core export. Rendering, conversion and encoding run in parallel stages.
     :param resolution: Resolution of video.
     :param fps: FPS of video.
     :param scenes: List of scenes to export in order of appearance.
@@ -56,51 +223,85 @@ def export_sc(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], path: str,
 
     video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, resolution)
     abs_start = time.time()
-    for i, scene in enumerate(scenes):
-        scene_frames = scene.get_frames()
-        scene_num_frames = len(scene_frames)
-        total_frames = 1
-        time_start = time.time()
-        for frame in scene_frames:
-            if verbose:
-                elapse = time.time() - time_start
-                per_frame = elapse / total_frames
-                remaining = per_frame * (scene_num_frames-total_frames)
-                remaining = str(remaining)[:6]
-                printer.clearline()
-                printer.write(f"[GRAPHICS] Exporting: Scene {i+1}/{len(scenes)}: Frame {total_frames}/{scene_num_frames}, {remaining}s remaining.")
-            total_frames += 1
-
-            surface = scene.render(resolution, frame)
-            surface = pygame.transform.rotate(pygame.transform.flip(surface, False, True), -90)
-            image = cv2.cvtColor(pygame.surfarray.array3d(surface), cv2.COLOR_RGB2BGR)
-            video.write(image)
-
-        if verbose:
-            printer.newline()
+    output_stats.clear()
+    try:
+        duplicates = export_pipelined(resolution, scenes, video.write, verbose)
+    finally:
+        video.release()
 
-    video.release()
     if verbose:
         elapse = time.time() - abs_start
         elapse = str(elapse)[:6]
         printer.clearline()
         printer.write(f"[GRAPHICS] Exporting video: Finished in {elapse}s")
         printer.newline()
+        print_duplicates(duplicates, scenes)
+        print_modifier_stats()
     if notify:
         notify_done()
 
 
-def mc_render(scene, frames, path, res):
-    for frame in frames:
-        curr_path = os.path.join(path, f"{frame}.png")
+def mc_worker(scenes: Tuple[Scene], resolution: Tuple[int], shm: shared_memory.SharedMemory, num_slots: int,
+        tasks: multiprocessing.Queue, done: multiprocessing.Queue) -> None:
+    """
+    Worker process of export_mc. Renders frames into shared memory slots.
+    Sends (index, slot, None) for each rendered frame, or (index, slot, error) if something failed,
+    where error is (exception, traceback text) and index and slot are None if it wasn't rendering a frame.
+    Meant for internal use.
+    """
+    index = slot = None
+    try:
+        slots = np.ndarray((num_slots, resolution[1], resolution[0], 3), dtype=np.uint8, buffer=shm.buf)
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+
+            index, scene_num, frame, slot = task
+            surface = scenes[scene_num].render(resolution, frame)
+            pixels = pygame.surfarray.pixels3d(surface)
+            slots[slot] = pixels.transpose(1, 0, 2)[..., ::-1]
+            del pixels
+            done.put((index, slot, None))
+            index = slot = None
+
+        del slots
+    except BaseException as error:
+        try:
+            pickle.dumps(error)
+        except Exception:
+            # Exceptions that can't be pickled are sent as their message.
+            error = RuntimeError(f"{type(error).__name__}: {error}")
+        done.put((index, slot, (error, traceback.format_exc())))
+
+
+def mc_wait(done: multiprocessing.Queue, processes: List[multiprocessing.Process]) -> Tuple[int]:
+    """
+    Returns (index, slot) of the next frame rendered by export_mc workers.
+    Errors of workers are raised again here, and an error is raised if a worker exits
+    without sending one (e.g. killed by the system), instead of waiting forever.
+    Meant for internal use.
+    """
+    while True:
+        try:
+            index, slot, error = done.get(timeout=1)
+            break
+        except queue.Empty:
+            for p in processes:
+                if not p.is_alive():
+                    raise RuntimeError(f"Export worker process {p.pid} exited unexpectedly with code {p.exitcode}.")
 
-        surface = scene.render(res, frame)
-        pygame.image.save(surface, curr_path)
+    if error is not None:
+        error, text = error
+        raise error from RuntimeError(f"Traceback of the worker process:\n{text}")
+    return index, slot
 
 
 def export_mc(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], out_path: str, verbose: bool = True, notify: bool = True) -> None:
     """
-    Multi core export. Will write images to disk.
+    Multi core export. A pool of worker processes renders frames into shared memory,
+    and frames are encoded in order as soon as they are ready.
+    At most (CPU count + options.EXPORT_QUEUE) frames are in memory at once.
     :param resolution: Resolution of video.
     :param fps: FPS of video.
     :param scenes: List of scenes to export in order of appearance.
@@ -111,76 +312,100 @@ def export_mc(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], out_path:
     if not out_path.endswith(".mp4"):
         raise ValueError("Path must be an MP4 (.mp4) file.")
 
+    # Baked before starting workers, so they receive the baked values.
+    jobs = []
+    duplicates = 0
+    for scene_num, scene in enumerate(scenes):
+        scene.bake()
+        last_fingerprint = None
+        for frame in scene.get_frames():
+            fingerprint = scene.get_fingerprint(frame)
+            jobs.append((scene_num, frame, fingerprint != last_fingerprint))
+            duplicates += fingerprint == last_fingerprint
+            last_fingerprint = fingerprint
+    render_jobs = [i for i, job in enumerate(jobs) if job[2]]
+
     num_cpus = multiprocessing.cpu_count()
-    path = get_tmp_path()
+    num_slots = num_cpus + get_export_queue()
+    width, height = resolution
+    shm = shared_memory.SharedMemory(create=True, size=num_slots*width*height*3)
+    slots = np.ndarray((num_slots, height, width, 3), dtype=np.uint8, buffer=shm.buf)
+    tasks = multiprocessing.Queue()
+    done = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=mc_worker, args=(scenes, resolution, shm, num_slots, tasks, done), daemon=True)
+        for _ in range(num_cpus)]
 
     video = cv2.VideoWriter(out_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, resolution)
     abs_start = time.time()
-    success = True
-    processes = []
+    success = False
+    image = None
     try:
-        for scene_num, scene in enumerate(scenes):
-            os.makedirs(path)
-            time_start = time.time()
-            processes = []
-            frames_to_render = scene.get_frames()
+        for p in processes:
+            p.start()
 
-            if len(frames_to_render) < num_cpus:
-                p = multiprocessing.Process(target=mc_render, args=(scene, frames_to_render, path, resolution))
-                processes.append(p)
+        free_slots = list(range(num_slots))
+        ready = {}
+        next_task = 0
+        scene_start = 0
+        time_start = time.time()
+        for i, (scene_num, frame, render) in enumerate(jobs):
+            # Keep all free slots busy. Tasks are sent in order, so the next frame to encode is always in progress.
+            while free_slots and next_task < len(render_jobs):
+                index = render_jobs[next_task]
+                tasks.put((index, jobs[index][0], jobs[index][1], free_slots.pop()))
+                next_task += 1
+
+            if render:
+                while i not in ready:
+                    index, slot = mc_wait(done, processes)
+                    ready[index] = slot
+                slot = ready.pop(i)
+                image = slots[slot]
+                video.write(image)
+                if i+1 < len(jobs) and not jobs[i+1][2]:
+                    image = image.copy()
+                free_slots.append(slot)
             else:
-                chunk_size = len(frames_to_render) / num_cpus
-                for i in range(num_cpus):
-                    start = int(chunk_size * i)
-                    end = int(chunk_size * (i+1))
-                    frames = frames_to_render[start:end]
-                    p = multiprocessing.Process(target=mc_render, args=(scene, frames, path, resolution))
-                    processes.append(p)
-
-            for p in processes:
-                p.start()
-
-            while True in [p.is_alive() for p in processes]:
-                time.sleep(0.05)
-                if verbose:
-                    num_files = max(1, len(os.listdir(path)))
-                    elapse = time.time() - time_start
-                    per_frame = elapse / num_files
-                    remaining = per_frame * (len(frames_to_render)-num_files)
-                    remaining = str(remaining)[:6]
-                    printer.clearline()
-                    printer.write(f"[GRAPHICS] Exporting: Scene {scene_num+1}/{len(scenes)}: " + \
-                        f"Frame {num_files}/{len(frames_to_render)}, {remaining}s remaining.")
-
-            printer.newline()
-            time.sleep(0.1)
-            for i, frame in enumerate(frames_to_render):
-                img_path = os.path.join(path, f"{frame}.png")
-                if os.path.isfile(img_path):
-                    img = cv2.imread(img_path)
-                    video.write(img)
+                video.write(image)
 
-                if verbose:
-                    num_done = i + 1
-                    elapse = time.time() - time_start
-                    per_frame = elapse / num_done
-                    remaining = per_frame * (len(frames_to_render)-num_done)
-                    remaining = str(remaining)[:6]
-                    printer.clearline()
-                    printer.write(f"[GRAPHICS] Exporting: Scene {scene_num+1}/{len(scenes)}: " + \
-                        f"Encoding {num_done}/{len(frames_to_render)}, {remaining}s remaining.")
+            if verbose:
+                if i == 0 or scene_num != jobs[i-1][0]:
+                    scene_start = i
+                    time_start = time.time()
+                scene_frames = len(scenes[scene_num].get_frames())
+                num_done = i - scene_start + 1
+                elapse = time.time() - time_start
+                per_frame = elapse / num_done
+                remaining = per_frame * (scene_frames-num_done)
+                remaining = str(remaining)[:6]
+                printer.clearline()
+                printer.write(f"[GRAPHICS] Exporting: Scene {scene_num+1}/{len(scenes)}: " + \
+                    f"Frame {num_done}/{scene_frames}, {remaining}s remaining.")
+                if num_done == scene_frames:
+                    printer.newline()
 
-            printer.newline()
-            shutil.rmtree(path)
+        success = True
 
     except KeyboardInterrupt:
-        for p in processes:
-            p.terminate()
-        time.sleep(0.1)
-        shutil.rmtree(path)
-        success = False
+        pass
+
+    finally:
+        if success:
+            for p in processes:
+                tasks.put(None)
+            for p in processes:
+                p.join()
+        else:
+            for p in processes:
+                p.terminate()
+            for p in processes:
+                if p.pid is not None:
+                    p.join()
+        video.release()
+        del image, slots
+        shm.close()
+        shm.unlink()
 
-    video.release()
     if success:
         if verbose:
             elapse = time.time() - abs_start
@@ -188,65 +413,375 @@ def export_mc(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], out_path:
             printer.clearline()
             printer.write(f"[GRAPHICS] Exporting video: Finished in {elapse}s")
             printer.newline()
+            print_duplicates(duplicates, scenes)
         if notify:
             notify_done()
 
 
-def export_ffmpeg(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], out_path: str, verbose: bool = True, notify: bool = True) -> None:
+class FFmpegWriter:
+    """
+    Streams raw BGR frames into the stdin of an FFmpeg process, which encodes them in one pass.
+    Writing blocks while FFmpeg is busy, so a slow encoder can't make memory grow.
     """
-    Single core export with FFmpeg compression.
+
+    def __init__(self, path: str, resolution: Tuple[int], fps: int, codec: str = "libx265", crf: int = 25,
+            preset: str = "medium", pix_fmt: str = "yuv420p", threads: int = 0) -> None:
+        """
+        Starts FFmpeg.
+        :param path: Output path of video.
+        :param resolution: Resolution of video.
+        :param fps: FPS of video.
+        :param codec: FFmpeg video codec, e.g. libx265, libx264.
+        :param crf: Constant rate factor (quality). Lower is better. Not passed if None.
+        :param preset: Encoder speed preset, e.g. ultrafast, medium, veryslow. Not passed if None.
+        :param pix_fmt: Pixel format of the output video.
+        :param threads: Number of encoder threads. 0 lets FFmpeg choose.
+        """
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("FFmpeg was not found. Please install it and add it to PATH.")
+
+        command = ["ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{resolution[0]}x{resolution[1]}", "-r", str(fps), "-i", "-",
+            "-an", "-c:v", codec, "-pix_fmt", pix_fmt, "-threads", str(threads)]
+        if crf is not None:
+            command.extend(["-crf", str(crf)])
+        if preset is not None:
+            command.extend(["-preset", preset])
+        command.append(path)
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, image: np.ndarray) -> None:
+        """
+        Writes one frame.
+        :param image: BGR image of shape (height, width, 3).
+        """
+        try:
+            self.process.stdin.write(np.ascontiguousarray(image).data)
+        except BrokenPipeError:
+            raise RuntimeError(f"FFmpeg stopped unexpectedly with exit code {self.process.wait()}.")
+
+    def release(self) -> None:
+        """
+        Finishes encoding and waits for FFmpeg to exit.
+        """
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.process.wait() != 0:
+            raise RuntimeError(f"FFmpeg exited with code {self.process.returncode}.")
+
+    def kill(self) -> None:
+        """
+        Stops FFmpeg without finishing the video.
+        """
+        self.process.kill()
+        self.process.wait()
+
+
+def export_ffmpeg(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], out_path: str, verbose: bool = True, notify: bool = True,
+        codec: str = "libx265", crf: int = 25, preset: str = "medium", pix_fmt: str = "yuv420p", threads: int = 0) -> None:
+    """
+    Single pass export with FFmpeg compression. Raw frames are piped into FFmpeg while rendering.
     :param resolution: Resolution of video.
     :param fps: FPS of video.
     :param scenes: List of scenes to export in order of appearance.
     :param path: Output path of final video (must be .mp4 for now).
     :param verbose: Whether to show information prints.
     :param notify: Whether to send a notification after exporting is finished.
+    :param codec: FFmpeg video codec, e.g. libx265, libx264.
+    :param crf: Constant rate factor (quality). Lower is better. Not passed if None.
+    :param preset: Encoder speed preset, e.g. ultrafast, medium, veryslow. Not passed if None.
+    :param pix_fmt: Pixel format of the output video.
+    :param threads: Number of encoder threads. 0 lets FFmpeg choose.
     """
     if not out_path.endswith(".mp4"):
         raise ValueError("Path must be an MP4 (.mp4) file.")
 
-    path = get_tmp_path() + ".mp4"
-
-    video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, resolution)
+    video = FFmpegWriter(out_path, resolution, fps, codec, crf, preset, pix_fmt, threads)
     abs_start = time.time()
-    for i, scene in enumerate(scenes):
-        scene_frames = scene.get_frames()
-        scene_num_frames = len(scene_frames)
-        total_frames = 1
-        time_start = time.time()
-        for frame in scene_frames:
-            if verbose:
-                elapse = time.time() - time_start
-                per_frame = elapse / total_frames
-                remaining = per_frame * (scene_num_frames-total_frames)
-                remaining = str(remaining)[:6]
-                printer.clearline()
-                printer.write(f"[GRAPHICS] Exporting: Scene {i+1}/{len(scenes)}: Frame {total_frames}/{scene_num_frames}, {remaining}s remaining.")
-            total_frames += 1
+    output_stats.clear()
+    try:
+        duplicates = export_pipelined(resolution, scenes, video.write, verbose)
+    except BaseException:
+        video.kill()
+        raise
+    video.release()
+
+    if verbose:
+        elapse = time.time() - abs_start
+        elapse = str(elapse)[:6]
+        printer.clearline()
+        printer.write(f"[GRAPHICS] Exporting video: Finished in {elapse}s")
+        printer.newline()
+        print_duplicates(duplicates, scenes)
+        print_modifier_stats()
+    if notify:
+        notify_done()
 
-            surface = scene.render(resolution, frame)
-            surface = pygame.transform.rotate(pygame.transform.flip(surface, False, True), -90)
-            image = cv2.cvtColor(pygame.surfarray.array3d(surface), cv2.COLOR_RGB2BGR)
-            video.write(image)
+
+def get_identity(obj: Any, _seen: set = None) -> Any:
+    """
+    Returns a description of everything about an object that isn't stored in property values, e.g. types and other
+    attributes of elements, which can be compared with repr. Properties only add the files their values refer to,
+    because their values are part of frame fingerprints. Paths of files add the size and modification time of the file,
+    and arrays and surfaces add a hash of their data. Caches and attributes starting with an underscore are left out.
+    Meant for internal use.
+    :param obj: Object to describe, e.g. a scene.
+    """
+    if _seen is None:
+        _seen = set()
+
+    if obj is None or isinstance(obj, (bool, int, float, complex, bytes)):
+        return obj
+    if isinstance(obj, str):
+        if os.path.isfile(obj):
+            stat = os.stat(obj)
+            return (obj, stat.st_size, stat.st_mtime_ns)
+        return obj
+    if isinstance(obj, np.ndarray):
+        data = np.ascontiguousarray(obj).data
+        return ("ndarray", obj.dtype.str, obj.shape, blake2b(data, digest_size=16).hexdigest())
+    if isinstance(obj, pygame.Surface):
+        data = pygame.image.tobytes(obj, "RGBA")
+        return ("Surface", obj.get_size(), blake2b(data, digest_size=16).hexdigest())
+    if isinstance(obj, Property):
+        if obj.dtype is not str:
+            return None
+        return tuple(get_identity(value) for value in obj.get_keyframe_values() if os.path.isfile(value))
+    if isinstance(obj, VectorProp):
+        return tuple(get_identity(prop) for prop in obj.elements)
+    if isinstance(obj, (LRUCache, StaticCache, BakeTable)):
+        return None
+    if isinstance(obj, (list, tuple)):
+        return tuple(get_identity(item, _seen) for item in obj)
+    if isinstance(obj, (set, frozenset)):
+        return tuple(sorted(repr(get_identity(item, _seen)) for item in obj))
+    if isinstance(obj, dict):
+        return tuple(sorted((repr(key), get_identity(value, _seen)) for key, value in obj.items()))
+    if isinstance(obj, (type, FunctionType, MethodType, BuiltinFunctionType, ModuleType)):
+        return getattr(obj, "__qualname__", getattr(obj, "__name__", type(obj).__name__))
+
+    name = (type(obj).__module__, type(obj).__qualname__)
+    if id(obj) in _seen:
+        return name
+    _seen.add(id(obj))
+    # The pickled state leaves out things that are different in each process, e.g. threads of video decoders.
+    state = obj.__getstate__() if hasattr(obj, "__getstate__") else getattr(obj, "__dict__", None)
+    if isinstance(state, dict):
+        state = {key: value for key, value in state.items() if not str(key).startswith("_")}
+    return (name, get_identity(state, _seen))
+
+
+def get_options_identity() -> Tuple[Any]:
+    """
+    Returns the values of all options that change rendered frames, see get_identity.
+    Meant for internal use.
+    """
+    names = sorted(name for name in vars(options) if name.isupper() and name not in PERFORMANCE_OPTIONS)
+    return tuple((name, get_identity(getattr(options, name))) for name in names)
+
+
+def get_segment_hashes(scenes: Tuple[Scene], jobs: Tuple[Tuple[int]], segment_size: int, settings: Tuple[Any]) -> List[str]:
+    """
+    Returns a hash of each segment of jobs, built from the fingerprints of its frames, everything else about
+    its scenes that changes frames (see get_identity), the options and the export settings.
+    Segments with equal hashes render to the same video.
+    Meant for internal use.
+    """
+    settings = (settings, get_options_identity())
+    scene_hashes = [sha256(repr(get_identity(scene)).encode()).hexdigest() for scene in scenes]
+
+    hashes = []
+    for start in range(0, len(jobs), segment_size):
+        hasher = sha256(repr(settings).encode())
+        last_scene = None
+        for scene_num, frame in jobs[start:start+segment_size]:
+            scene = scenes[scene_num]
+            if scene_num != last_scene:
+                hasher.update(scene_hashes[scene_num].encode())
+                last_scene = scene_num
+            hasher.update(repr(scene.get_fingerprint(frame)).encode())
+        hashes.append(hasher.hexdigest())
+
+    return hashes
+
+
+def read_manifest(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the finished segments listed in a manifest, indexed by hash.
+    Segments whose video file is missing are left out.
+    Meant for internal use.
+    """
+    try:
+        with open(os.path.join(path, "manifest.json"), "r") as file:
+            segments = json.load(file)["segments"]
+    except (OSError, ValueError, KeyError):
+        return {}
+    return {s["hash"]: s for s in segments if os.path.isfile(os.path.join(path, s["file"]))}
+
+
+def write_manifest(path: str, segments: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Writes the finished segments to a manifest. The old manifest is only replaced once the new one is complete.
+    Meant for internal use.
+    """
+    tmp_path = os.path.join(path, "manifest.json.tmp")
+    with open(tmp_path, "w") as file:
+        json.dump({"segments": list(segments.values())}, file, indent=4)
+    os.replace(tmp_path, os.path.join(path, "manifest.json"))
+
+
+def concat_segments(paths: Tuple[str], out_path: str) -> None:
+    """
+    Joins segment videos into one video with FFmpeg, without encoding them again.
+    Meant for internal use.
+    """
+    list_path = out_path + ".concat.txt"
+    with open(list_path, "w") as file:
+        for path in paths:
+            path = os.path.abspath(path).replace("'", "'\\''")
+            file.write(f"file '{path}'\n")
+
+    try:
+        command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", out_path]
+        if subprocess.Popen(command).wait() != 0:
+            raise RuntimeError("FFmpeg failed to join the segments.")
+    finally:
+        os.remove(list_path)
+
+
+def export_segmented(resolution: Tuple[int], fps: int, scenes: Tuple[Scene], out_path: str, verbose: bool = True, notify: bool = True,
+        codec: str = "libx265", crf: int = 25, preset: str = "medium", pix_fmt: str = "yuv420p", threads: int = 0,
+        segment_size: int = None, keep_segments: bool = False) -> None:
+    """
+    Resumable export. The video is encoded with FFmpeg in independent segments,
+    which are listed in a manifest once finished and joined without encoding again at the end.
+    If the export is interrupted, running it again with the same scenes skips finished segments.
+    Segments are stored in (out_path + ".segments").
+    :param resolution: Resolution of video.
+    :param fps: FPS of video.
+    :param scenes: List of scenes to export in order of appearance.
+    :param out_path: Output path of final video (must be .mp4 for now).
+    :param verbose: Whether to show information prints.
+    :param notify: Whether to send a notification after exporting is finished.
+    :param codec: FFmpeg video codec, e.g. libx265, libx264.
+    :param crf: Constant rate factor (quality). Lower is better. Not passed if None.
+    :param preset: Encoder speed preset, e.g. ultrafast, medium, veryslow. Not passed if None.
+    :param pix_fmt: Pixel format of the output video.
+    :param threads: Number of encoder threads. 0 lets FFmpeg choose.
+    :param segment_size: Number of frames in each segment. Defaults to options.EXPORT_SEGMENT.
+    :param keep_segments: Whether to keep the segments after joining them, so later exports can reuse unchanged segments.
+    """
+    if not out_path.endswith(".mp4"):
+        raise ValueError("Path must be an MP4 (.mp4) file.")
+    if segment_size is None:
+        segment_size = get_export_segment()
+
+    jobs = []
+    for scene_num, scene in enumerate(scenes):
+        scene.bake()
+        jobs.extend((scene_num, frame) for frame in scene.get_frames())
+
+    settings = (tuple(resolution), fps, codec, crf, preset, pix_fmt)
+    hashes = get_segment_hashes(scenes, jobs, segment_size, settings)
+    seg_path = out_path + ".segments"
+    os.makedirs(seg_path, exist_ok=True)
+    finished = read_manifest(seg_path)
+
+    abs_start = time.time()
+    output_stats.clear()
+    duplicates = 0
+    rendered = 0
+    skipped = 0
+    for i, seg_hash in enumerate(hashes):
+        start = i * segment_size
+        end = min(start+segment_size, len(jobs))
+        if seg_hash in finished:
+            skipped += 1
+            continue
 
         if verbose:
-            printer.newline()
+            elapse = time.time() - abs_start
+            remaining = "?" if rendered == 0 else str(elapse / rendered * (len(hashes)-skipped-rendered))[:6]
+            printer.clearline()
+            printer.write(f"[GRAPHICS] Exporting: Segment {i+1}/{len(hashes)}: Frames {start+1}-{end}/{len(jobs)}, " + \
+                f"{remaining}s remaining.")
+
+        frames = [[] for _ in scenes]
+        for scene_num, frame in jobs[start:end]:
+            frames[scene_num].append(frame)
+
+        file_name = seg_hash[:16] + ".mp4"
+        tmp_path = os.path.join(seg_path, seg_hash[:16] + ".tmp.mp4")
+        video = FFmpegWriter(tmp_path, resolution, fps, codec, crf, preset, pix_fmt, threads)
+        try:
+            duplicates += export_pipelined(resolution, scenes, video.write, False, frames)
+        except BaseException:
+            video.kill()
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            if verbose:
+                printer.newline()
+                printer.write(f"[GRAPHICS] Exporting stopped. {len(finished)} finished segments are kept in {seg_path}")
+                printer.newline()
+            raise
+        video.release()
 
-    video.release()
-    time.sleep(0.1)
-    os.system(f"ffmpeg -y -i {path} -c:v libx265 -c:a copy -x265-params crf=25 {out_path}")
-    os.remove(path)
+        os.replace(tmp_path, os.path.join(seg_path, file_name))
+        finished[seg_hash] = {"hash": seg_hash, "file": file_name, "start": start, "end": end}
+        write_manifest(seg_path, finished)
+        rendered += 1
+
+    if verbose:
+        printer.clearline()
+        printer.write(f"[GRAPHICS] Exporting: Joining {len(hashes)} segments, {skipped} reused from a previous export.")
+        printer.newline()
+    concat_segments([os.path.join(seg_path, finished[h]["file"]) for h in hashes], out_path)
+
+    if keep_segments:
+        # Segments of other versions of the scenes are removed.
+        used = set(hashes)
+        for seg_hash, segment in list(finished.items()):
+            if seg_hash not in used:
+                os.remove(os.path.join(seg_path, segment["file"]))
+                del finished[seg_hash]
+        write_manifest(seg_path, finished)
+    else:
+        shutil.rmtree(seg_path)
 
     if verbose:
         elapse = time.time() - abs_start
         elapse = str(elapse)[:6]
-        printer.clearline()
         printer.write(f"[GRAPHICS] Exporting video: Finished in {elapse}s")
         printer.newline()
+        if rendered > 0:
+            printer.write(f"[GRAPHICS] Reused {duplicates} duplicate frames in {rendered} rendered segments.")
+            printer.newline()
+        print_modifier_stats()
     if notify:
         notify_done()
 
 
+def print_duplicates(duplicates: int, scenes: Tuple[Scene]) -> None:
+    """
+    Prints how many frames were duplicates of the frame before, and weren't rendered.
+    """
+    total = sum(len(scene.get_frames()) for scene in scenes)
+    printer.write(f"[GRAPHICS] Reused {duplicates}/{total} duplicate frames.")
+    printer.newline()
+
+
+def print_modifier_stats() -> None:
+    """
+    Prints how many outputs of each cacheable modifier type were reused from modifiers.output_cache.
+    """
+    for name, (hits, misses) in output_stats.items():
+        printer.write(f"[GRAPHICS] Modifier cache: {name}: Reused {hits}/{hits+misses} outputs.")
+        printer.newline()
+
+
 def notify_done():
     if sys.platform == "linux":
         subprocess.Popen(["notify-send", "Graphic Videos", "Finished exporting an animation!"]).wait()
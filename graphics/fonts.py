@@ -0,0 +1,151 @@
+#
+#  Graphic Videos
+#  An API for creating graphic videos in Python.
+#  Copyright Medilocus 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import os
+import sys
+import json
+from typing import List, Tuple
+import pygame
+import pygame.sysfont
+from .options import *
+from .cache import LRUCache
+from .utils import get_cache_path
+pygame.init()
+
+# Whether pygame's system fonts have been loaded in this process.
+index_loaded = False
+
+# Loaded fonts, keyed by (family or path, size, bold, italic).
+font_cache = LRUCache(get_font_cache())
+
+# Rendered text, keyed by (text, font key, color, antialias).
+text_cache = LRUCache(get_text_cache(), lambda surf: surf.get_bytesize() * surf.get_width() * surf.get_height())
+
+
+def get_font_dirs() -> List[str]:
+    """
+    Returns the directories fonts are installed in on this platform.
+    """
+    home = os.path.expanduser("~")
+    if sys.platform == "win32":
+        return [os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+            os.path.join(os.environ.get("LOCALAPPDATA", home), "Microsoft", "Windows", "Fonts")]
+    elif sys.platform == "darwin":
+        return ["/System/Library/Fonts", "/Library/Fonts", os.path.join(home, "Library", "Fonts")]
+    else:
+        return ["/usr/share/fonts", "/usr/local/share/fonts", os.path.join(home, ".fonts"),
+            os.path.join(home, ".local", "share", "fonts")]
+
+
+def get_font_dirs_signature() -> List[Tuple[str, int]]:
+    """
+    Returns the modification times of all font directories and their subdirectories.
+    Adding or removing a font changes the signature.
+    """
+    signature = []
+    for font_dir in get_font_dirs():
+        for root, dirs, files in os.walk(font_dir):
+            try:
+                signature.append([root, os.stat(root).st_mtime_ns])
+            except OSError:
+                pass
+    return sorted(signature)
+
+
+def load_font_index() -> None:
+    """
+    Loads pygame's system fonts from the index on disk, so fonts aren't searched for in every process.
+    If the index is missing or fonts were installed or removed since, fonts are searched and the index is saved.
+    """
+    global index_loaded
+    if index_loaded:
+        return
+    index_loaded = True
+    if pygame.sysfont.is_init or not get_font_index():
+        return
+
+    path = get_cache_path("fontindex.json")
+    signature = get_font_dirs_signature()
+    try:
+        with open(path, "r") as file:
+            index = json.load(file)
+        if index["platform"] == sys.platform and index["signature"] == signature:
+            fonts = {name: {(bold, italic): font_path for bold, italic, font_path in styles}
+                for name, styles in index["fonts"].items()}
+            pygame.sysfont.Sysfonts.clear()
+            pygame.sysfont.Sysfonts.update(fonts)
+            pygame.sysfont.create_aliases()
+            pygame.sysfont.is_init = True
+            return
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    pygame.sysfont.initsysfonts()
+    fonts = {name: [[bold, italic, font_path] for (bold, italic), font_path in styles.items()]
+        for name, styles in pygame.sysfont.Sysfonts.items()}
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w") as file:
+            json.dump({"platform": sys.platform, "signature": signature, "fonts": fonts}, file)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def load_font(family: str, size: int, bold: bool = False, italic: bool = False) -> pygame.font.Font:
+    """
+    Returns a font, which is only loaded the first time it is used.
+    Font families are looked up in the font index, see ``load_font_index``.
+    :param family: Font family, or path to a font file. Bold and italic don't apply to font files.
+    :param size: Font size.
+    :param bold: Whether the font is bold.
+    :param italic: Whether the font is italic.
+    """
+    key = (family, size, bold, italic)
+    font = font_cache.get(key)
+    if font is None:
+        if os.path.isfile(family):
+            font = pygame.font.Font(family, size)
+        else:
+            load_font_index()
+            font = pygame.font.SysFont(family, size, bold, italic)
+        font_cache.put(key, font)
+    return font
+
+
+def render_text(text: str, family: str, size: int, color: Tuple[int], antialias: bool = True,
+        bold: bool = False, italic: bool = False) -> pygame.Surface:
+    """
+    Returns a surface of rendered text, which is only rendered the first time it is used.
+    The surface is shared, so it must not be changed.
+    :param text: Text to render.
+    :param family: Font family, or path to a font file.
+    :param size: Font size.
+    :param color: Color of text.
+    :param antialias: Whether to antialias text.
+    :param bold: Whether the font is bold.
+    :param italic: Whether the font is italic.
+    """
+    key = (text, (family, size, bold, italic), tuple(color), antialias)
+    surf = text_cache.get(key)
+    if surf is None:
+        surf = load_font(family, size, bold, italic).render(text, antialias, color)
+        text_cache.put(key, surf)
+    return surf
@@ -18,16 +18,52 @@
 #
 
 from typing import List, Tuple
+import numpy as np
 import pygame
 from .props import *
 from .elements import BaseElement
-from .modifiers import Modifier
+from .modifiers import Modifier, apply_modifiers
 pygame.init()
 
 
+def scale_surface(surf: pygame.Surface, cols: np.ndarray, rows: np.ndarray) -> pygame.Surface:
+    """
+    Scales a surface with nearest neighbour sampling, where pixel (x, y) of the result is pixel (cols[x], rows[y]).
+    """
+    if surf.get_bytesize() != 4:
+        surface = pygame.Surface(surf.get_size(), pygame.SRCALPHA)
+        surface.blit(surf, (0, 0))
+        surf = surface
+
+    result = pygame.Surface((len(cols), len(rows)), surf.get_flags() & pygame.SRCALPHA, surf)
+    pixels = pygame.surfarray.pixels2d(surf)
+    pygame.surfarray.pixels2d(result)[...] = pixels[cols[:, np.newaxis], rows]
+    del pixels
+    return result
+
+
+def map_axis(start: int, coords: np.ndarray, loc: int, size: int, res: int) -> Tuple[int, np.ndarray]:
+    """
+    Maps coordinates of a parent to coordinates of a group on one axis, the same way as rendering the group
+    at resolution res and scaling it to size with pygame.transform.scale, which shows pixel i * res // size
+    at pixel i. Pixels outside of the group are removed.
+    Returns (start, coordinates) of the pixels inside the group.
+    :param start: Final pixel of the first coordinate.
+    :param coords: Coordinates of the parent, one for each final pixel, which never decrease.
+    :param loc: Location of group in the parent.
+    :param size: Size of group in the parent.
+    :param res: Resolution the group is rendered at.
+    """
+    first, last = np.searchsorted(coords, (loc, loc+size))
+    local = coords[first:last] - loc
+    return start+int(first), local * res // size
+
+
 class Group(BaseElement):
     """Group class, which contains elements and modifiers."""
 
+    pixel_props = ("loc", "size")
+
     loc: VectorProp
     size: VectorProp
     elements: List[BaseElement]
@@ -45,15 +81,22 @@ class Group(BaseElement):
         self.elements = []
         self.modifiers = []
 
+    @property
+    def cacheable(self) -> bool:
+        # A group changes whenever one of its elements changes without its properties changing.
+        return all(element.cacheable for element in self.elements)
+
     def add_element(self, element: BaseElement) -> None:
         """
         Appends element.
         :param element: Element to append.
         """
         self.elements.append(element)
+        bump_revision()
 
     def extend_elements(self, elements: Tuple[BaseElement]) -> None:
         self.elements.extend(elements)
+        bump_revision()
 
     def add_modifier(self, modifier: Modifier) -> None:
         """
@@ -61,25 +104,84 @@ class Group(BaseElement):
         :param modifier: Modifier to append.
         """
         self.modifiers.append(modifier)
+        bump_revision()
 
     def extend_modifiers(self, modifiers: Tuple[Modifier]) -> None:
         self.modifiers.extend(modifiers)
+        bump_revision()
 
-    def render(self, res: Tuple[int], frame: int) -> pygame.Surface:
+    def render_raw(self, res: Tuple[int], frame: int) -> pygame.Surface:
         surface = pygame.Surface(res, pygame.SRCALPHA)
-        final_surf = pygame.Surface(res, pygame.SRCALPHA)
-
         for element in self.elements:
             if element.show(frame):
-                surface.blit(element.render(res, frame), (0, 0))
-        for modifier in self.modifiers:
-            if modifier.show(frame):
-                surface = modifier.modify(surface, frame)
+                surf, loc = element.render_bbox(res, frame)
+                surface.blit(surf, loc)
+        return apply_modifiers(self.modifiers, surface, (0, 0), res, frame)[0]
+
+    def render_bbox(self, res: Tuple[int], frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+        if any(m.show(frame) for m in self.modifiers):
+            # Modifiers work on the whole group, so it is rendered at full resolution and scaled.
+            surface = self.render_raw(res, frame)
+            surface = pygame.transform.scale(surface, self.size(frame))
+            return surface, self.loc(frame)
 
+        layers = self.render_layers(res, frame)
+        if not layers:
+            return pygame.Surface((0, 0), pygame.SRCALPHA), self.loc(frame)
+
+        x1 = min(dest[0] for surf, dest, area in layers)
+        y1 = min(dest[1] for surf, dest, area in layers)
+        x2 = max(dest[0]+area[2] for surf, dest, area in layers)
+        y2 = max(dest[1]+area[3] for surf, dest, area in layers)
+        surface = pygame.Surface((x2-x1, y2-y1), pygame.SRCALPHA)
+        surface.blits([(surf, (dest[0]-x1, dest[1]-y1), area) for surf, dest, area in layers], doreturn=False)
+        return surface, (x1, y1)
+
+    def render_layers(self, res: Tuple[int], frame: int, coords: Tuple[Tuple[int, np.ndarray]] = None
+            ) -> List[Tuple[pygame.Surface, Tuple[int], Tuple[int]]]:
+        """
+        Renders children as layers, which are already scaled and placed in the final coordinates.
+        Only the bounding box of each child is scaled, instead of the whole group.
+        Nested groups without modifiers add their own layers, so all groups are composited in one pass.
+        Returns a list of (surface, dest, area) to blit.
+        :param res: Resolution to render.
+        :param frame: Frame to render.
+        :param coords: (start, coordinates) for each axis. Final pixels start, start+1, ... show the given
+            coordinates of the parent. Defaults to the whole frame, where the parent is the frame.
+        """
+        if coords is None:
+            coords = ((0, np.arange(res[0])), (0, np.arange(res[1])))
         loc = self.loc(frame)
         size = self.size(frame)
+        coords = tuple(map_axis(*coords[i], loc[i], size[i], res[i]) for i in range(2))
+        (x, cols), (y, rows) = coords
+        if not len(cols) or not len(rows):
+            return []
+
+        layers = []
+        for element in self.elements:
+            if not element.show(frame):
+                continue
+            if isinstance(element, Group) and not any(m.show(frame) for m in element.modifiers):
+                layers.extend(element.render_layers(res, frame, coords))
+                continue
+
+            surf, surf_loc = element.render_bbox(res, frame)
+            # Coordinates never decrease, so the pixels showing the child are one range on each axis.
+            x1, x2 = np.searchsorted(cols, (surf_loc[0], surf_loc[0]+surf.get_width()))
+            y1, y2 = np.searchsorted(rows, (surf_loc[1], surf_loc[1]+surf.get_height()))
+            if x2 <= x1 or y2 <= y1:
+                continue
+
+            surf_cols = cols[x1:x2] - surf_loc[0]
+            surf_rows = rows[y1:y2] - surf_loc[1]
+            dest = (x+int(x1), y+int(y1))
+            if surf_cols[-1]-surf_cols[0] == x2-x1-1 and surf_rows[-1]-surf_rows[0] == y2-y1-1:
+                # Not scaled, so the child is blitted directly.
+                layers.append((surf, dest, (int(surf_cols[0]), int(surf_rows[0]), int(x2-x1), int(y2-y1))))
+                continue
 
-        surface = pygame.transform.scale(surface, size)
-        final_surf.blit(surface, loc)
+            layer = scale_surface(surf, surf_cols, surf_rows)
+            layers.append((layer, dest, (0, 0, *layer.get_size())))
 
-        return final_surf
+        return layers
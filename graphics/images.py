@@ -0,0 +1,82 @@
+#
+#  Graphic Videos
+#  An API for creating graphic videos in Python.
+#  Copyright Medilocus 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import os
+from typing import Tuple
+import pygame
+from .options import *
+from .cache import LRUCache
+pygame.init()
+
+# Loaded images keyed by (path, modification time), and scaled images keyed by (path, modification time, size, filter).
+image_cache = LRUCache(get_image_cache(), lambda surf: surf.get_bytesize() * surf.get_width() * surf.get_height())
+
+# Functions that scale images, by filter name.
+FILTERS = {
+    "nearest": pygame.transform.scale,
+    "smooth": pygame.transform.smoothscale,
+}
+
+
+def convert(surf: pygame.Surface) -> pygame.Surface:
+    """
+    Returns surf in the 32 bit pixel format with alpha that rendered surfaces use, which is faster to blit.
+    :param surf: Surface to convert.
+    """
+    if pygame.display.get_surface() is not None:
+        return surf.convert_alpha()
+    return surf.convert(pygame.Surface((1, 1), pygame.SRCALPHA))
+
+
+def load_image(path: str) -> pygame.Surface:
+    """
+    Returns an image, which is only loaded the first time it is used, and again after the file changes.
+    The surface is shared, so it must not be changed.
+    :param path: Path of image.
+    """
+    key = (os.path.realpath(path), os.stat(path).st_mtime_ns)
+    image = image_cache.get(key)
+    if image is None:
+        image = convert(pygame.image.load(path))
+        image_cache.put(key, image)
+    return image
+
+
+def scale_image(path: str, size: Tuple[int], filter: str = "nearest") -> pygame.Surface:
+    """
+    Returns an image scaled to size, which is only scaled the first time it is used.
+    The surface is shared, so it must not be changed.
+    :param path: Path of image.
+    :param size: Size (x, y) to scale to.
+    :param filter: "nearest" (pygame.transform.scale) or "smooth" (pygame.transform.smoothscale).
+    """
+    if filter not in FILTERS:
+        raise ValueError(f"Filter must be one of {', '.join(FILTERS)}, got {filter!r}.")
+
+    size = tuple(size)
+    image = load_image(path)
+    if image.get_size() == size:
+        return image
+
+    key = (os.path.realpath(path), os.stat(path).st_mtime_ns, size, filter)
+    scaled = image_cache.get(key)
+    if scaled is None:
+        scaled = FILTERS[filter](image, size)
+        image_cache.put(key, scaled)
+    return scaled
@@ -17,19 +17,54 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from typing import Tuple
+import sys
+from math import ceil
+from typing import Any, Tuple
+from hashlib import blake2b
 from PIL import Image, ImageFilter, ImageEnhance, ImageOps
 import numpy as np
 import pygame
+import cv2
 from .props import *
+from .cache import LRUCache
 pygame.init()
 
+# All 8 bit values, which lookup tables are computed from.
+RAMP = np.arange(256, dtype=np.uint8)
+IDENTITY_LUT = np.tile(RAMP, (3, 1))
+
+# Kernel of PIL's ImageFilter.SMOOTH, used by ModSharpen.
+SMOOTH_KERNEL = np.array([[1, 1, 1], [1, 5, 1], [1, 1, 1]], dtype=np.float32) / 13
+
+# Lookup tables of modifiers, keyed by modifier type and property values.
+lut_cache = LRUCache(1024)
+
+# Outputs of cacheable modifiers, keyed by modifier type, property values and a hash of the input pixels.
+output_cache = LRUCache(get_modifier_cache(), lambda surf: surf.get_bytesize() * surf.get_width() * surf.get_height())
+
+# Hits and misses of output_cache for each modifier type name.
+output_stats = {}
+
 
 class Modifier:
     """Base modifier class. Other modifiers should inherit from this."""
 
     show: BoolProp
 
+    # Number of pixels around the bounding box that the modifier reads or changes.
+    # 0 means the modifier only changes each pixel by itself, None means it needs the whole frame.
+    margin: int = None
+
+    # Weights of the channels, which are mixed into one rounded gray value before the lookup table is applied.
+    mix: Tuple[float] = None
+
+    # Whether lut needs the mean gray value of the visible pixels.
+    needs_mean: bool = False
+
+    # Whether outputs can be reused while the input and properties stay the same, see output_cache.
+    # Only worth it for slow modifiers, because the input has to be hashed.
+    cacheable: bool = False
+
     def __init__(self) -> None:
         """
         Initializes base modifier. Inherited classes should have their own init
@@ -37,18 +72,292 @@ class Modifier:
         """
         self.show = BoolProp(True)
 
+    def get_margin(self, frame: int) -> int:
+        """
+        Returns the margin at a frame. Defaults to self.margin.
+        Modifiers whose margin depends on properties (e.g. blur radius) should define this.
+        :param frame: Frame to modify.
+        """
+        return self.margin
+
     def modify(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        #alpha = pygame.surfarray.array_alpha(src)
+        """
+        Modifies a surface, keeping its alpha.
+        Uses lut or modify_array if the modifier defines them, otherwise modify_raw.
+        :param src: Source surface.
+        :param frame: Frame to modify.
+        """
+        if uses_lut(self) or uses_array(self):
+            return apply_modifiers((self,), src, (0, 0), src.get_size(), frame)[0]
+
         non_alpha = pygame.Surface(src.get_size())
-        non_alpha.blit(src, (0, 0))
+        pygame.surfarray.pixels3d(non_alpha)[...] = pygame.surfarray.pixels3d(src)
         result = self.modify_raw(non_alpha, frame)
-        #result = pygame.surfarray.array3d(result)
-        #result = np.dstack((result, alpha)).swapaxes(1, 0).tostring()
-        #surf = pygame.image.fromstring(result, src.get_size(), "RGBA")
-        return result
+        if not src.get_flags() & pygame.SRCALPHA or result.get_size() != src.get_size():
+            return result
+
+        surf = pygame.Surface(src.get_size(), pygame.SRCALPHA)
+        surf.blit(result, (0, 0))
+        pygame.surfarray.pixels_alpha(surf)[...] = pygame.surfarray.pixels_alpha(src)
+        return surf
 
     def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:...
 
+    def modify_array(self, rgb: np.ndarray, alpha: np.ndarray, frame: int) -> np.ndarray:
+        """
+        Modifies pixels as a float32 array of shape (x, y, 3) with values from 0 to 255.
+        Modifiers that define this are run together in one pass, without converting to surfaces in between.
+        Values are clipped to 0 to 255 after each modifier, and truncated to integers after the last one, like PIL.
+        Returns the modified array, which may be rgb itself.
+        :param rgb: Color of pixels.
+        :param alpha: Alpha of pixels (uint8 array of shape (x, y)). Must not be changed.
+        :param frame: Frame to modify.
+        """
+        raise NotImplementedError
+
+    def lut(self, frame: int, mean: int) -> np.ndarray:
+        """
+        Returns a lookup table of shape (3, 256) or (256,), which maps each value of each channel to its modified value.
+        Lookup tables of consecutive modifiers are composed into one, so each pixel is looked up once.
+        Tables are cached by the property values of the modifier, so they must only depend on properties and mean.
+        :param frame: Frame to modify.
+        :param mean: Rounded mean gray value of the visible pixels if needs_mean is True, otherwise None.
+        """
+        raise NotImplementedError
+
+
+def uses_array(modifier: Modifier) -> bool:
+    """
+    Returns whether the modifier defines modify_array.
+    """
+    return type(modifier).modify_array is not Modifier.modify_array
+
+
+def uses_lut(modifier: Modifier) -> bool:
+    """
+    Returns whether the modifier defines lut.
+    """
+    return type(modifier).lut is not Modifier.lut
+
+
+def get_params(modifier: Modifier, frame: int) -> Tuple[Any]:
+    """
+    Returns the type and values of all properties of a modifier, which identify its effect.
+    """
+    return (type(modifier), tuple(prop(frame) for prop in iter_props(modifier)))
+
+
+def get_lut(modifier: Modifier, frame: int, mean: int) -> np.ndarray:
+    """
+    Returns the lookup table of shape (3, 256) of a modifier, from the cache if its properties didn't change.
+    """
+    key = (get_params(modifier, frame), mean)
+    lut = lut_cache.get(key)
+    if lut is None:
+        lut = np.ascontiguousarray(np.broadcast_to(modifier.lut(frame, mean), (3, 256)), dtype=np.uint8)
+        lut_cache.put(key, lut)
+    return lut
+
+
+def pil_blend_lut(degenerate: int, factor: float) -> np.ndarray:
+    """
+    Returns the lookup table of PIL's Image.blend of a solid gray image and each value.
+    PIL's enhancers (e.g. ImageEnhance.Brightness) are such blends.
+    """
+    image = Image.frombytes("L", (256, 1), RAMP.tobytes())
+    solid = Image.new("L", (256, 1), degenerate)
+    return np.asarray(Image.blend(solid, image, factor))[0]
+
+
+def surface_bytes(surf: pygame.Surface) -> np.ndarray:
+    """
+    Returns the pixels of a 32 bit surface as a uint8 array of shape (height, width, 4), which shares its memory.
+    The order of channels is the byte order of the surface, see channel_offsets.
+    Returns None if the surface isn't 32 bit or its rows are padded.
+    """
+    if surf.get_bytesize() != 4 or surf.get_pitch() != surf.get_width()*4:
+        return None
+    pixels = pygame.surfarray.pixels2d(surf).T
+    return pixels.view(np.uint8).reshape(surf.get_height(), surf.get_width(), 4)
+
+
+def channel_offsets(surf: pygame.Surface) -> Tuple[int]:
+    """
+    Returns the byte offsets of the R, G, B and A channels in each pixel of a 32 bit surface.
+    """
+    offsets = [shift // 8 for shift in surf.get_shifts()]
+    if sys.byteorder == "big":
+        offsets = [3-offset for offset in offsets]
+    return tuple(offsets)
+
+
+def modify_cached(modifier: Modifier, surf: pygame.Surface, frame: int) -> Tuple[pygame.Surface, bool]:
+    """
+    Applies a modifier with modify, reusing an earlier output from output_cache if the modifier is cacheable.
+    Returns (surface, cached), where cached means the surface is also stored in the cache and must not be changed.
+    """
+    if not modifier.cacheable:
+        return modifier.modify(surf, frame), False
+
+    pixels = surface_bytes(surf)
+    data = pygame.image.tobytes(surf, "RGBA") if pixels is None else pixels.data
+    key = (get_params(modifier, frame), surf.get_size(), channel_offsets(surf), blake2b(data, digest_size=16).digest())
+    del pixels, data
+
+    stats = output_stats.setdefault(type(modifier).__name__, [0, 0])
+    result = output_cache.get(key)
+    if result is None:
+        stats[1] += 1
+        result = modifier.modify(surf, frame)
+        output_cache.put(key, result)
+    else:
+        stats[0] += 1
+    return result, True
+
+
+def apply_luts(surf: pygame.Surface, modifiers: Tuple[Modifier], frame: int) -> pygame.Surface:
+    """
+    Applies modifiers that define lut to a surface with alpha. The surface is changed in place if possible.
+    The tables are composed first, so each pixel is looked up once.
+    Only mixing modifiers (e.g. grayscale) and needs_mean read the pixels in between.
+    Returns the modified surface.
+    :param surf: Surface to modify.
+    :param modifiers: Modifiers to apply in order.
+    :param frame: Frame to modify.
+    """
+    if surface_bytes(surf) is None:
+        surface = pygame.Surface(surf.get_size(), pygame.SRCALPHA)
+        surface.blit(surf, (0, 0))
+        surf = surface
+
+    pixels = surface_bytes(surf)
+    offsets = channel_offsets(surf)
+    rgb = list(offsets[:3])
+    alpha = pixels[..., offsets[3]]
+    opaque = alpha.min() == 255
+
+    def apply(lut):
+        # Lookup table of all 4 channels, alpha stays the same.
+        table = np.tile(RAMP[:, np.newaxis], (1, 4))
+        table[:, rgb] = lut.T
+        cv2.LUT(pixels, table[np.newaxis], dst=pixels)
+
+    lut = IDENTITY_LUT
+    hists = None
+    for modifier in modifiers:
+        if modifier.mix is not None:
+            if lut is not IDENTITY_LUT:
+                apply(lut)
+            matrix = np.zeros((1, 4), dtype=np.float64)
+            matrix[0, rgb] = modifier.mix
+            gray = cv2.transform(pixels, matrix)
+            pixels[..., rgb] = gray.reshape(*gray.shape[:2], 1)
+            lut = IDENTITY_LUT
+            hists = None
+
+        mean = None
+        if modifier.needs_mean:
+            if not alpha.any():
+                means = (0, 0, 0)
+            elif lut is IDENTITY_LUT and opaque:
+                means = [cv2.mean(pixels)[i] for i in rgb]
+            else:
+                # Mean of each channel after the tables so far, from histograms of the pixels.
+                if hists is None and opaque:
+                    hists = [cv2.calcHist([pixels], [i], None, [256], (0, 256)).ravel() for i in rgb]
+                elif hists is None:
+                    hists = [np.bincount(pixels[..., i].ravel(), alpha.ravel(), 256) for i in rgb]
+                means = [np.dot(hists[i], lut[i]) / hists[i].sum() for i in range(3)]
+            # Mixed into gray like PIL's "L" mode.
+            mean = int(np.dot(means, (0.299, 0.587, 0.114)) + 0.5)
+
+        lut = np.take_along_axis(get_lut(modifier, frame, mean), lut, axis=1)
+
+    if lut is not IDENTITY_LUT:
+        apply(lut)
+    del pixels, alpha
+    return surf
+
+
+def luminance(rgb: np.ndarray, weights: Tuple[float]) -> np.ndarray:
+    """
+    Returns the weighted sum of the channels of a float array of shape (x, y, 3).
+    """
+    gray = rgb[..., 0] * np.float32(weights[0])
+    gray += rgb[..., 1] * np.float32(weights[1])
+    gray += rgb[..., 2] * np.float32(weights[2])
+    return gray
+
+
+def apply_modifiers(modifiers: Tuple[Modifier], surf: pygame.Surface, loc: Tuple[int], res: Tuple[int],
+        frame: int) -> Tuple[pygame.Surface, Tuple[int]]:
+    """
+    Applies modifiers to a surface placed at loc in a frame of resolution res.
+    Consecutive modifiers that define lut are composed into one lookup table,
+    and consecutive modifiers that define modify_array share one float buffer, so each run is one pass.
+    If all modifiers have a margin, only the bounding box (plus margins, inside the frame) is modified,
+    so the result may be larger than surf. Otherwise the surface is expanded to the whole frame first.
+    Returns (surface, loc) like BaseElement.render_bbox. The input surface isn't changed.
+    :param modifiers: Modifiers to apply in order. Hidden modifiers are skipped.
+    :param surf: Surface to modify.
+    :param loc: Location of the top left corner of surf in the frame.
+    :param res: Resolution of the frame.
+    :param frame: Frame to modify.
+    """
+    modifiers = [m for m in modifiers if m.show(frame)]
+    if not modifiers:
+        return surf, loc
+
+    margins = [m.get_margin(frame) for m in modifiers]
+    if None in margins:
+        x0, y0, x1, y1 = 0, 0, res[0], res[1]
+    else:
+        # The region is clamped to the frame, so modifiers that read neighbours see the edges of the frame
+        # at the edges of the surface, same as when modifying the whole frame.
+        pad = sum(margins)
+        x0 = max(loc[0]-pad, 0)
+        y0 = max(loc[1]-pad, 0)
+        x1 = min(loc[0]+surf.get_width()+pad, res[0])
+        y1 = min(loc[1]+surf.get_height()+pad, res[1])
+        if x1 <= x0 or y1 <= y0:
+            # Entirely outside of the frame.
+            return surf, loc
+
+    result = pygame.Surface((x1-x0, y1-y0), pygame.SRCALPHA)
+    result.blit(surf, (loc[0]-x0, loc[1]-y0))
+
+    # Whether result is stored in output_cache, so it must be copied before changing it in place.
+    cached = False
+    i = 0
+    while i < len(modifiers):
+        if cached and (uses_lut(modifiers[i]) or uses_array(modifiers[i])):
+            result = result.copy()
+            cached = False
+
+        if uses_lut(modifiers[i]):
+            start = i
+            while i < len(modifiers) and uses_lut(modifiers[i]):
+                i += 1
+            result = apply_luts(result, modifiers[start:i], frame)
+            continue
+
+        if not uses_array(modifiers[i]):
+            result, cached = modify_cached(modifiers[i], result, frame)
+            i += 1
+            continue
+
+        pixels = pygame.surfarray.pixels3d(result)
+        alpha = pygame.surfarray.pixels_alpha(result)
+        rgb = pixels.astype(np.float32)
+        while i < len(modifiers) and uses_array(modifiers[i]) and not uses_lut(modifiers[i]):
+            rgb = modifiers[i].modify_array(rgb, alpha, frame)
+            np.clip(rgb, 0, 255, out=rgb)
+            i += 1
+        pixels[...] = rgb
+        del pixels, alpha
+
+    return result, (x0, y0)
+
 
 class ModFlip(Modifier):
     """Flips the surface along x or y or both axes."""
@@ -66,6 +375,9 @@ class ModFlip(Modifier):
         self.x = BoolProp(x)
         self.y = BoolProp(y)
 
+    def modify(self, src: pygame.Surface, frame: int) -> pygame.Surface:
+        return self.modify_raw(src, frame)
+
     def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
         x = self.x(frame)
         y = self.y(frame)
@@ -79,28 +391,33 @@ class ModMixSolidColor(Modifier):
     color: VectorProp
     fac: FloatProp
 
+    margin = 0
+
     def __init__(self, color: Tuple[int] = (0, 0, 0, 0), fac: float = 0.5):
         super().__init__()
         self.color = VectorProp(4, IntProp, color)
         self.fac = FloatProp(fac)
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
+    def lut(self, frame: int, mean: int) -> np.ndarray:
         color = self.color(frame)
         fac = self.fac(frame)
         color[3] = int(fac*color[3])
 
-        surf = pygame.Surface(src.get_size())
-        color_surf = pygame.Surface(src.get_size(), pygame.SRCALPHA)
+        # Blits the color onto a ramp, so the table matches pygame's blending exactly.
+        ramp = pygame.Surface((256, 1))
+        pygame.surfarray.pixels3d(ramp)[...] = RAMP[:, np.newaxis, np.newaxis]
+        color_surf = pygame.Surface((256, 1), pygame.SRCALPHA)
         color_surf.fill(color)
-        surf.blit(src, (0, 0))
-        surf.blit(color_surf, (0, 0))
+        ramp.blit(color_surf, (0, 0))
 
-        return surf
+        return pygame.surfarray.array3d(ramp)[:, 0].T
 
 
 class ModHsva(Modifier):
     """Changes surface HSVA."""
 
+    cacheable = True
+
     def __init__(self) -> None:
         """
         Initializes modifier.
@@ -115,38 +432,97 @@ class ModHsva(Modifier):
 
 
 class ModGaussianBlur(Modifier):
-    """Blurs the surface using Gaussian Blur"""
+    """
+    Blurs the surface using Gaussian Blur, including its alpha.
+    Only the bounding box of the element, grown by 3 times the radius, is blurred.
+    Large radii are blurred at a lower resolution, see options.BLUR_MIN_RADIUS.
+    """
 
     radius: FloatProp
 
+    cacheable = True
+
     def __init__(self, radius: float = 4) -> None:
         """
         Initializes modifier.
-        :param radius: Radius of blurring
+        :param radius: Radius (standard deviation) of blurring
         """
         super().__init__()
         self.radius = FloatProp(radius)
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = pygame.surfarray.pixels3d(src).swapaxes(1, 0)
-        img = Image.fromarray(surf).filter(ImageFilter.GaussianBlur(self.radius(frame)))
-        data = (img.tobytes(), img.size, img.mode)
-        return pygame.image.fromstring(*data)
+    def get_margin(self, frame: int) -> int:
+        return max(ceil(3*self.radius(frame)), 0)
+
+    def modify(self, src: pygame.Surface, frame: int) -> pygame.Surface:
+        radius = self.radius(frame)
+        if radius <= 0:
+            return src
+
+        if surface_bytes(src) is None:
+            surface = pygame.Surface(src.get_size(), pygame.SRCALPHA)
+            surface.blit(src, (0, 0))
+            src = surface
+        offsets = channel_offsets(src)
+        pixels = surface_bytes(src)
+        width, height = src.get_size()
+
+        # Blurred with premultiplied alpha, so transparent pixels don't bleed their color.
+        # Edge pixels are extended, like blurring the whole frame. Edges of a bounding box inside the frame
+        # are transparent, because the margin is added around it, so extending them is the same as a constant border.
+        image = pixels.astype(np.float32)
+        alpha = image[..., offsets[3]].copy()
+        image *= alpha[..., np.newaxis] / 255
+        image[..., offsets[3]] = alpha
+        del pixels
+
+        scale = 1
+        min_radius = get_blur_min_radius()
+        if min_radius > 0:
+            while radius / (scale*2) >= min_radius and width >= scale*4 and height >= scale*4:
+                scale *= 2
+
+        size = 2*ceil(3*radius/scale) + 1
+        if scale > 1:
+            # Edges are extended at full resolution, far enough that the blur never reaches the border of the
+            # small image, and to a multiple of scale so each small pixel is the average of scale*scale pixels.
+            pad = ceil(3*radius/scale) * scale
+            right = pad + (-width) % scale
+            bottom = pad + (-height) % scale
+            image = cv2.copyMakeBorder(image, pad, bottom, pad, right, cv2.BORDER_REPLICATE)
+            padded = image.shape[1::-1]
+            small = cv2.resize(image, (padded[0]//scale, padded[1]//scale), interpolation=cv2.INTER_AREA)
+            small = cv2.GaussianBlur(small, (size, size), radius/scale, borderType=cv2.BORDER_REPLICATE)
+            image = cv2.resize(small, padded, interpolation=cv2.INTER_LINEAR)[pad:pad+height, pad:pad+width]
+        else:
+            image = cv2.GaussianBlur(image, (size, size), radius, borderType=cv2.BORDER_REPLICATE)
+
+        alpha = image[..., offsets[3]].copy()
+        visible = alpha > 0
+        image[visible] *= (255 / alpha[visible])[:, np.newaxis]
+        image[..., offsets[3]] = alpha
+        np.clip(image, 0, 255, out=image)
+        image += 0.5
+
+        result = pygame.Surface(src.get_size(), pygame.SRCALPHA)
+        surface_bytes(result)[...] = image
+        return result
 
 
 class ModGrayscale(Modifier):
     """Converts the surface into grayscale"""
 
+    margin = 0
+    mix = (0.216, 0.587, 0.144)
+
     def __init__(self) -> None:
         """
         Initializes modifier.
         """
         super().__init__()
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = np.dstack((np.resize(pygame.surfarray.array3d(src), (*src.get_size(), 3)), np.ones(src.get_size())))
-        arr = surf.dot([0.216, 0.587, 0.144, 1])[..., np.newaxis].repeat(3, 2)
-        return pygame.surfarray.make_surface(arr)
+    def lut(self, frame: int, mean: int) -> np.ndarray:
+        # The gray value is raised by 1, same as before lookup tables.
+        return np.minimum(RAMP.astype(np.int64) + 1, 255)
 
 
 class ModBright(Modifier):
@@ -154,6 +530,8 @@ class ModBright(Modifier):
 
     factor: FloatProp
 
+    margin = 0
+
     def __init__(self, factor: float = 4) -> None:
         """
         Initializes modifier.
@@ -162,11 +540,8 @@ class ModBright(Modifier):
         super().__init__()
         self.factor = FloatProp(factor)
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = pygame.surfarray.pixels3d(src).swapaxes(1, 0)
-        img = ImageEnhance.Brightness(Image.fromarray(surf)).enhance(self.factor(frame))
-        data = (img.tobytes(), img.size, img.mode)
-        return pygame.image.fromstring(*data)
+    def lut(self, frame: int, mean: int) -> np.ndarray:
+        return pil_blend_lut(0, self.factor(frame))
 
 
 class ModContrast(Modifier):
@@ -174,6 +549,9 @@ class ModContrast(Modifier):
 
     factor: FloatProp
 
+    margin = 0
+    needs_mean = True
+
     def __init__(self, factor: float = 4) -> None:
         """
         Initializes modifier.
@@ -182,11 +560,8 @@ class ModContrast(Modifier):
         super().__init__()
         self.factor = FloatProp(factor)
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = pygame.surfarray.pixels3d(src).swapaxes(1, 0)
-        img = ImageEnhance.Contrast(Image.fromarray(surf)).enhance(self.factor(frame))
-        data = (img.tobytes(), img.size, img.mode)
-        return pygame.image.fromstring(*data)
+    def lut(self, frame: int, mean: int) -> np.ndarray:
+        return pil_blend_lut(mean, self.factor(frame))
 
 
 class ModColorEnhance(Modifier):
@@ -194,6 +569,8 @@ class ModColorEnhance(Modifier):
 
     factor: FloatProp
 
+    margin = 0
+
     def __init__(self, factor: float = 4) -> None:
         """
         Initializes modifier.
@@ -202,11 +579,16 @@ class ModColorEnhance(Modifier):
         super().__init__()
         self.factor = FloatProp(factor)
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = pygame.surfarray.pixels3d(src).swapaxes(1, 0)
-        img = ImageEnhance.Color(Image.fromarray(surf)).enhance(self.factor(frame))
-        data = (img.tobytes(), img.size, img.mode)
-        return pygame.image.fromstring(*data)
+    def modify_array(self, rgb: np.ndarray, alpha: np.ndarray, frame: int) -> np.ndarray:
+        # Rounded gray value, same as converting to "L" in PIL.
+        gray = luminance(rgb, (19595/65536, 38470/65536, 7471/65536))
+        gray += 0.5
+        gray = np.floor(gray, out=gray)[..., np.newaxis]
+        # Same float32 math as PIL's Image.blend of the gray and original image.
+        rgb -= gray
+        rgb *= np.float32(self.factor(frame))
+        rgb += gray
+        return rgb
 
 
 class ModSharpen(Modifier):
@@ -214,6 +596,8 @@ class ModSharpen(Modifier):
 
     factor: FloatProp
 
+    margin = 1
+
     def __init__(self, factor: float = 4) -> None:
         """
         Initializes modifier.
@@ -222,24 +606,30 @@ class ModSharpen(Modifier):
         super().__init__()
         self.factor = FloatProp(factor)
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = pygame.surfarray.pixels3d(src).swapaxes(1, 0)
-        img = ImageEnhance.Sharpness(Image.fromarray(surf)).enhance(self.factor(frame))
-        data = (img.tobytes(), img.size, img.mode)
-        return pygame.image.fromstring(*data)
+    def modify_array(self, rgb: np.ndarray, alpha: np.ndarray, frame: int) -> np.ndarray:
+        # Rounded smoothed image, same as PIL's ImageFilter.SMOOTH, which doesn't change the outermost pixels.
+        smooth = cv2.filter2D(rgb, -1, SMOOTH_KERNEL, borderType=cv2.BORDER_REPLICATE)
+        smooth += 0.5
+        smooth = np.floor(smooth, out=smooth)
+        smooth[[0, -1]] = rgb[[0, -1]]
+        smooth[:, [0, -1]] = rgb[:, [0, -1]]
+        # Same float32 math as PIL's Image.blend of the smoothed and original image.
+        rgb -= smooth
+        rgb *= np.float32(self.factor(frame))
+        rgb += smooth
+        return rgb
 
 
 class ModInvert(Modifier):
     """Inverts surface"""
 
+    margin = 0
+
     def __init__(self) -> None:
         """
         Initializes modifier
         """
         super().__init__()
 
-    def modify_raw(self, src: pygame.Surface, frame: int) -> pygame.Surface:
-        surf = pygame.surfarray.pixels3d(src).swapaxes(1, 0)
-        img = ImageOps.invert(Image.fromarray(surf))
-        data = (img.tobytes(), img.size, img.mode)
-        return pygame.image.fromstring(*data)
+    def lut(self, frame: int, mean: int) -> np.ndarray:
+        return 255 - RAMP
@@ -36,6 +36,48 @@ def get_mb_frames():
 def get_mb_step():
     return MB_STEP
 
+def get_mb_pixel_step():
+    return MB_PIXEL_STEP
+
+def get_mb_cache():
+    return MB_CACHE
+
+def get_export_queue():
+    return EXPORT_QUEUE
+
+def get_export_segment():
+    return EXPORT_SEGMENT
+
+def get_blur_min_radius():
+    return BLUR_MIN_RADIUS
+
+def get_modifier_cache():
+    return MODIFIER_CACHE
+
+def get_font_cache():
+    return FONT_CACHE
+
+def get_text_cache():
+    return TEXT_CACHE
+
+def get_font_index():
+    return FONT_INDEX
+
+def get_image_cache():
+    return IMAGE_CACHE
+
+def get_sprite_cache():
+    return SPRITE_CACHE
+
+def get_video_buffer():
+    return VIDEO_BUFFER
+
+def get_video_seek():
+    return VIDEO_SEEK
+
+def get_cache_dir():
+    return CACHE_DIR
+
 
 # Sigmoid is no longer used.
 SIGMOID_XRANGE = 3
@@ -47,3 +89,35 @@ DEFAULT_FONT = "arial"
 COLOR_PALETTE = {}
 MB_FRAMES = 14
 MB_STEP = 0.25
+# Largest movement (pixels) allowed between two motion blur subframes before more subframes are sampled.
+MB_PIXEL_STEP = 2
+# Maximum bytes of motion blur subframes kept by each scene for reuse by the next frames.
+MB_CACHE = 128 * 1024**2
+# Maximum number of frames waiting between each stage of pipelined exports.
+EXPORT_QUEUE = 8
+# Number of frames in each segment of segmented exports.
+EXPORT_SEGMENT = 300
+# Blurs are computed at a lower resolution where their radius is still at least this,
+# which keeps errors of the blended colors within about 2/255, also at the edges of the frame.
+# 0 always blurs at full resolution.
+BLUR_MIN_RADIUS = 4
+# Maximum bytes of modifier outputs kept for reuse, shared by preview and export.
+MODIFIER_CACHE = 256 * 1024**2
+# Maximum number of loaded fonts kept for reuse.
+FONT_CACHE = 64
+# Maximum bytes of rendered text kept for reuse.
+TEXT_CACHE = 64 * 1024**2
+# Whether installed fonts are indexed on disk, so new processes don't search for them again.
+FONT_INDEX = True
+# Directory of files kept between runs, e.g. the font index.
+# None uses graphic_videos in the user's cache directory (XDG_CACHE_HOME or ~/.cache, LOCALAPPDATA on Windows).
+CACHE_DIR = None
+# Maximum bytes of loaded and scaled images kept for reuse.
+IMAGE_CACHE = 256 * 1024**2
+# Maximum bytes of shapes drawn by shape batches kept for reuse.
+SPRITE_CACHE = 64 * 1024**2
+# Number of decoded frames kept by each video, which are decoded ahead of the frame being rendered.
+VIDEO_BUFFER = 32
+# Video frames up to this far ahead are decoded instead of seeking, which decodes from the previous keyframe.
+# Only used if the keyframes of a video can't be listed with ffmpeg.
+VIDEO_SEEK = 48
@@ -22,6 +22,7 @@ import pygame
 from ..scene import Scene
 from .elements import FrameText, Slider
 from ..options import get_font
+from ..fonts import load_font
 pygame.init()
 
 
@@ -53,7 +54,7 @@ def launch(resolution: Tuple[int], fps, scenes: Tuple[Scene], resizable: bool =
         clock.tick(fps)
         window.fill((0, 0, 0))
         events = pygame.event.get()
-        font = pygame.font.SysFont(get_font(), bottom_bar_height-5)
+        font = load_font(get_font(), bottom_bar_height-5)
         text_size = font.size("Frame: " + frame_text.text + "9"*(5-len(frame_text.text)))
         draw_frame = lambda: draw_current(resolution, scenes, slider.value, image)
         if frame_text.draw(window, events, width, height, text_size, font):
@@ -17,10 +17,88 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from typing import Any, Tuple
-from math import e
+from typing import Any, Dict, Iterator, List, Tuple
+from types import FunctionType, MethodType, ModuleType
+from bisect import bisect_right
+from contextlib import contextmanager
+from math import e, inf
+from weakref import WeakSet
+import numpy as np
 from .options import *
 
+_revision = 0
+_context = None
+# Stamps of baked values that are still valid, see BakeStamp.
+_stamps = WeakSet()
+
+
+def get_revision() -> int:
+    """
+    Returns the current revision of all animation data.
+    The revision changes whenever a keyframe is inserted or an element's modifiers change.
+    """
+    return _revision
+
+
+def bump_revision() -> None:
+    """
+    Invalidates all caches that depend on animation data.
+    Meant for internal use.
+    """
+    global _revision
+    _revision += 1
+    for stamp in _stamps:
+        stamp.valid = False
+    _stamps.clear()
+
+
+class FrameContext:
+    """
+    Memoizes property values while a frame is rendered, so a property read by an element,
+    its show property and its modifiers is only evaluated once per frame.
+    Values are forgotten when the revision changes, e.g. when a keyframe is inserted.
+    """
+
+    revision: int
+    values: Dict[Tuple[Any, Any], Any]
+
+    def __init__(self) -> None:
+        self.revision = _revision
+        self.values = {}
+
+    def get(self, prop: Any, frame: Any) -> Any:
+        """
+        Returns the value of prop at frame, which is only evaluated the first time.
+        :param prop: Property or VectorProp.
+        :param frame: Frame to get value.
+        """
+        if self.revision != _revision:
+            self.values.clear()
+            self.revision = _revision
+        key = (prop, frame)
+        if key not in self.values:
+            self.values[key] = prop.get_value(frame)
+        return self.values[key]
+
+
+@contextmanager
+def frame_context() -> Iterator[FrameContext]:
+    """
+    Memoizes property values while rendering a frame, see FrameContext.
+    Contexts can be nested, e.g. a scene rendered inside another scene's frame, and the outer context is kept.
+    Used by Scene.render_frame.
+    """
+    global _context
+    if _context is not None:
+        yield _context
+        return
+
+    _context = FrameContext()
+    try:
+        yield _context
+    finally:
+        _context = None
+
 
 class Keyframe:
     """Keyframe class, used for storing (frame, value, interp)"""
@@ -51,13 +129,16 @@ def interpolate(key1: Keyframe, key2: Keyframe, frame: int) -> Any:
     elif key1.interp == "PARABOLIC":
         fac = (frame-key1.frame) / (key2.frame-key1.frame)
         para_max = get_pbola_xmax() ** 2
+        # Squares are written as multiplications so they match Property.sample exactly.
         if fac > 0.5:
             fac = 1 - fac
-            fac = (get_pbola_xmax()/0.5 * fac) ** 2
+            fac = get_pbola_xmax()/0.5 * fac
+            fac = fac * fac
             fac = -1 * fac / 2 / para_max
             fac += 1
         else:
-            fac = (get_pbola_xmax()/0.5 * fac) ** 2
+            fac = get_pbola_xmax()/0.5 * fac
+            fac = fac * fac
             fac = fac / 2 / para_max
         value = fac * (key2.value-key1.value) + key1.value
         return value
@@ -74,15 +155,47 @@ def interpolate(key1: Keyframe, key2: Keyframe, frame: int) -> Any:
         raise NotImplementedError(f"Interpolation {key1.interp} is not supported.")
 
 
+def interpolate_array(interp: str, fac: np.ndarray, value1: np.ndarray, value2: np.ndarray) -> np.ndarray:
+    """
+    Vectorized version of interpolate, for many factors at once.
+    Produces the exact same values as interpolate.
+    Meant for internal use.
+    :param interp: Interpolation of the first keyframe.
+    :param fac: Array of factors between the keyframes, (frame-frame1) / (frame2-frame1).
+    :param value1: Values of the first keyframes.
+    :param value2: Values of the second keyframes.
+    """
+    if interp == "CONSTANT":
+        return value1
+
+    elif interp == "LINEAR":
+        return fac * (value2-value1) + value1
+
+    elif interp == "PARABOLIC":
+        para_max = get_pbola_xmax() ** 2
+        upper = fac > 0.5
+        fac = get_pbola_xmax()/0.5 * np.where(upper, 1-fac, fac)
+        fac = fac * fac
+        fac = np.where(upper, -1 * fac / 2 / para_max + 1, fac / 2 / para_max)
+        return fac * (value2-value1) + value1
+
+    else:
+        raise NotImplementedError(f"Interpolation {interp} is not supported.")
+
+
 class Property:
     """Base property class. BoolProp, IntProp... extends off of this."""
 
     dtype: Any
+    sample_dtype: Any
     default_interp: str
     allowed_interps: Tuple[str]
 
     _default_val: Any
     _keyframes: Tuple[Keyframe]
+    _frames: Tuple[int]
+    _arrays: Tuple[np.ndarray]
+    _baked: Tuple[Any]
 
     def __init__(self, default_val: Any) -> None:
         """
@@ -91,12 +204,19 @@ class Property:
         """
         self._default_val = self.dtype(default_val)
         self._keyframes = []
+        self._frames = []
+        self._arrays = None
+        self._baked = None
 
     def __call__(self, frame: int) -> Any:
         """
         Faster way to do self.get_value(frame).
+        Values are memoized while a frame is rendered, see frame_context.
         :param frame: Frame to get value. The value will change based on the keyframes.
         """
+        # Baked values are already fast to get.
+        if _context is not None and self._baked is None:
+            return _context.get(self, frame)
         return self.get_value(frame)
 
     def keyframe(self, value: Any, frame: int, interp: str = None) -> None:
@@ -110,25 +230,43 @@ class Property:
             interp = self.default_interp
         if interp not in self.allowed_interps:
             raise ValueError(f"Interpolation {interp} not allowed.")
-        self._keyframes.append(Keyframe(frame, self.dtype(value), interp))
-        self._keyframes.sort(key=lambda x: x.frame)
+        # Keyframes are kept sorted by frame. New keyframes go after existing ones on the same frame.
+        idx = bisect_right(self._frames, frame)
+        self._keyframes.insert(idx, Keyframe(frame, self.dtype(value), interp))
+        self._frames.insert(idx, frame)
+        self._arrays = None
+        bump_revision()
+
+    def get_keyframe_values(self) -> List[Any]:
+        """
+        Returns the default value and the values of all keyframes.
+        """
+        return [self._default_val] + [key.value for key in self._keyframes]
+
+    def find_keyframe(self, frame: int) -> int:
+        """
+        Returns the index of the last keyframe at or before frame, or -1 if frame is before all keyframes.
+        :param frame: Frame to search.
+        """
+        return bisect_right(self._frames, frame) - 1
 
     def get_value(self, frame: int) -> Any:
         """
         Gets property value at frame. Returns default_val if no keyframes exist.
         :param frame: Frame to get value. The value will change based on the keyframes.
         """
+        if self._baked is not None and type(frame) is int:
+            stamp, start, values = self._baked
+            if stamp.valid and 0 <= frame-start < len(values):
+                return values[frame-start]
+
         if len(self._keyframes) == 0:
             rval = self._default_val
         else:
             if frame < self._keyframes[0].frame:
                 rval = self._keyframes[0].value
             else:
-                low_idx = len(self._keyframes) - 1
-                for i, key in enumerate(self._keyframes):
-                    if key.frame > frame:
-                        low_idx = i - 1
-                        break
+                low_idx = self.find_keyframe(frame)
 
                 if low_idx == len(self._keyframes) - 1:
                     rval = self._keyframes[-1].value
@@ -137,6 +275,58 @@ class Property:
 
         return self.dtype(rval)
 
+    def sample(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Gets property values at many frames at once. Returns the same values as get_value.
+        :param frames: Array of frames.
+        """
+        frames = np.asarray(frames)
+        if len(self._keyframes) == 0:
+            return np.full(frames.shape, self._default_val, dtype=self.sample_dtype)
+
+        if self._arrays is None:
+            key_frames = np.array(self._frames)
+            values = np.array([key.value for key in self._keyframes], dtype=self.sample_dtype)
+            interps = np.array([key.interp for key in self._keyframes])
+            self._arrays = (key_frames, values, interps)
+        key_frames, values, interps = self._arrays
+
+        low_idx = np.searchsorted(key_frames, frames, side="right") - 1
+        result = values[np.clip(low_idx, 0, len(values)-1)]
+
+        middle = (low_idx >= 0) & (low_idx < len(values)-1)
+        for interp in ("LINEAR", "PARABOLIC"):
+            mask = middle.copy()
+            mask[middle] = interps[low_idx[middle]] == interp
+            if not mask.any():
+                continue
+            idx = low_idx[mask]
+            fac = (frames[mask]-key_frames[idx]) / (key_frames[idx+1]-key_frames[idx])
+            value = interpolate_array(interp, fac, values[idx], values[idx+1])
+            result[mask] = np.trunc(value) if self.dtype is int else value
+
+        return result
+
+    def static_range(self, frame: int) -> Tuple[float]:
+        """
+        Returns (start, end) of the frame range around frame where the value doesn't change.
+        start is inclusive and end is exclusive. The range is empty if the value is changing at frame.
+        :param frame: Frame to check.
+        """
+        if len(self._keyframes) == 0:
+            return (-inf, inf)
+        if frame < self._keyframes[0].frame:
+            return (-inf, self._keyframes[0].frame)
+
+        low_idx = self.find_keyframe(frame)
+        if low_idx == len(self._keyframes) - 1:
+            return (self._keyframes[-1].frame, inf)
+
+        key1, key2 = self._keyframes[low_idx], self._keyframes[low_idx+1]
+        if key1.interp == "CONSTANT" or key1.value == key2.value:
+            return (key1.frame, key2.frame)
+        return (frame, frame)
+
 
 class VectorProp:
     """Vector property, a list of properties."""
@@ -144,6 +334,7 @@ class VectorProp:
     length: int
     dtype: Property
     elements: Tuple[Property]
+    _baked: Tuple[Any]
 
     def __init__(self, length: int, dtype: Any, init_val: Any) -> None:
         """
@@ -156,8 +347,13 @@ class VectorProp:
         self.elements = [dtype(init_val[i]) for i in range(length)]
         self.length = length
         self.dtype = dtype
+        self._baked = None
 
     def __call__(self, frame: int) -> Tuple[Any]:
+        if self._baked is not None and type(frame) is int:
+            stamp, start, rows = self._baked
+            if stamp.valid and 0 <= frame-start < len(rows):
+                return list(rows[frame-start])
         return [p(frame) for p in self.elements]
 
     def __getitem__(self, index: int) -> Property:
@@ -188,7 +384,160 @@ class VectorProp:
         Returs a list of the value of each prop.
         :param frame: Frame to get value. The value will change based on inserted keyframes.
         """
-        return [p(frame) for p in self.elements]
+        return self(frame)
+
+    def sample(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Gets values at many frames at once, as an array of shape (len(frames), length).
+        :param frames: Array of frames.
+        """
+        return np.stack([p.sample(frames) for p in self.elements], axis=-1)
+
+    def static_range(self, frame: int) -> Tuple[float]:
+        """
+        Returns (start, end) of the frame range around frame where no element changes.
+        :param frame: Frame to check.
+        """
+        return static_range(self.elements, frame)
+
+
+def static_range(props: Tuple[Property], frame: int) -> Tuple[float]:
+    """
+    Returns the intersection of the static ranges of all props at frame.
+    :param props: Properties to check.
+    :param frame: Frame to check.
+    """
+    start, end = -inf, inf
+    for prop in props:
+        prop_start, prop_end = prop.static_range(frame)
+        start = max(start, prop_start)
+        end = min(end, prop_end)
+        if start >= end:
+            return (frame, frame)
+    return (start, end)
+
+
+def iter_props(obj: Any, vectors: bool = False, _seen: set = None) -> Iterator[Property]:
+    """
+    Yields every property reachable from an object, e.g. all props of an element,
+    its modifiers and its child elements.
+    :param obj: Object to search.
+    :param vectors: Whether to yield VectorProps themselves instead of their elements.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return
+    _seen.add(id(obj))
+
+    if isinstance(obj, Property):
+        yield obj
+    elif isinstance(obj, VectorProp):
+        if vectors:
+            yield obj
+        else:
+            yield from obj.elements
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            yield from iter_props(item, vectors, _seen)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            yield from iter_props(item, vectors, _seen)
+    elif isinstance(obj, (type, ModuleType, FunctionType, MethodType)):
+        return
+    elif hasattr(obj, "__dict__"):
+        for item in vars(obj).values():
+            yield from iter_props(item, vectors, _seen)
+
+
+class BakeStamp:
+    """
+    Marks the values of a BakeTable as valid until the revision changes.
+    Stamps are pickled with the properties, so baked values stay valid in other processes,
+    where the revision starts again from 0.
+    """
+
+    valid: bool
+
+    def __init__(self) -> None:
+        self.valid = True
+        _stamps.add(self)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.valid:
+            _stamps.add(self)
+
+
+class BakeTable:
+    """
+    Columnar table of the values of animated properties over a range of frames.
+    Baked properties read their values from the table instead of evaluating keyframes.
+    The values are stored on the properties, so pickled elements (e.g. in worker processes) keep them.
+    Inserting a keyframe anywhere makes all tables stale, and properties go back to evaluating keyframes.
+    """
+
+    start: int
+    end: int
+    props: List[Property]
+    vectors: List[VectorProp]
+    columns: List[np.ndarray]
+
+    def __init__(self, obj: Any, start: int, end: int) -> None:
+        """
+        Evaluates all animated properties reachable from obj.
+        :param obj: Object to bake, e.g. a list of elements.
+        :param start: First frame to bake.
+        :param end: Frame after the last frame to bake.
+        """
+        self.start = start
+        self.end = end
+        self.props = []
+        self.vectors = []
+        self.columns = []
+
+        frames = np.arange(start, end)
+        columns = {}
+        for prop in iter_props(obj, vectors=True):
+            if isinstance(prop, VectorProp):
+                if any(len(p._keyframes) > 0 for p in prop.elements):
+                    self.vectors.append(prop)
+                    self.props.extend(p for p in prop.elements if id(p) not in columns)
+                    columns.update((id(p), None) for p in prop.elements)
+            elif isinstance(prop, ArrayProp):
+                # Array props are evaluated for all instances at once, so baking wouldn't save time.
+                continue
+            elif len(prop._keyframes) > 0 and id(prop) not in columns:
+                self.props.append(prop)
+                columns[id(prop)] = None
+
+        self.columns = [prop.sample(frames) for prop in self.props]
+        self.attach()
+
+    def __getitem__(self, prop: Property) -> np.ndarray:
+        return self.columns[self.props.index(prop)]
+
+    def attach(self) -> None:
+        """
+        Makes properties read their values from this table.
+        """
+        values = {}
+        stamp = BakeStamp()
+        for prop, column in zip(self.props, self.columns):
+            values[id(prop)] = column.tolist()
+            prop._baked = (stamp, self.start, values[id(prop)])
+        for vector in self.vectors:
+            rows = [values[id(p)] for p in vector.elements]
+            vector._baked = (stamp, self.start, list(zip(*rows)))
+
+    def detach(self) -> None:
+        """
+        Makes properties evaluate their keyframes again.
+        """
+        for prop in self.props:
+            prop._baked = None
+        for vector in self.vectors:
+            vector._baked = None
 
 
 class BoolProp(Property):
@@ -199,6 +548,7 @@ class BoolProp(Property):
     dtype = bool
     default_interp = "CONSTANT"
     allowed_interps = ("CONSTANT",)
+    sample_dtype = bool
 
     def __repr__(self):
         return f"<BoolProp object, default_val={self._default_val}>"
@@ -212,6 +562,7 @@ class IntProp(Property):
     dtype = int
     default_interp = "PARABOLIC"
     allowed_interps = ("LINEAR", "PARABOLIC", "CONSTANT")
+    sample_dtype = np.int64
 
     def __repr__(self):
         return f"<IntProp object, default_val={self._default_val}>"
@@ -225,6 +576,7 @@ class FloatProp(Property):
     dtype = float
     default_interp = "PARABOLIC"
     allowed_interps = ("LINEAR", "PARABOLIC", "CONSTANT")
+    sample_dtype = np.float64
 
     def __repr__(self):
         return f"<FloatProp object, default_val={self._default_val}>"
@@ -238,6 +590,216 @@ class StringProp(Property):
     dtype = str
     default_interp = "CONSTANT"
     allowed_interps = ("CONSTANT",)
+    sample_dtype = object
 
     def __repr__(self):
         return f"<StringProp object, default_val={self._default_val}>"
+
+
+class ArrayProp(Property):
+    """
+    Array property, which holds the values of many instances (e.g. the shapes of a ShapeBatch) as one array.
+    The first axis of the array is the instance, and keyframes can be inserted for all instances or only some.
+    Each instance is interpolated between its own keyframes, like a separate property.
+    Interpolations: LINEAR, PARABOLIC, CONSTANT
+    """
+    default_interp = "PARABOLIC"
+    allowed_interps = ("LINEAR", "PARABOLIC", "CONSTANT")
+
+    shape: Tuple[int]
+
+    def __init__(self, shape: Tuple[int], dtype: Any, init_val: Any) -> None:
+        """
+        Initializes array property.
+        :param shape: Shape of the values, (instances, ...).
+        :param dtype: Type of the values, int or float. Interpolated int values are truncated like IntProp.
+        :param init_val: Value of all instances, or an array of the value of each instance.
+        """
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.sample_dtype = np.int64 if dtype is int else np.float64
+        self._default_val = self.convert(init_val, self.shape[0])
+        self._keyframes = []
+        self._frames = []
+        self._arrays = None
+        self._baked = None
+
+    def __repr__(self):
+        return f"<ArrayProp object, shape={self.shape}>"
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, index: int) -> "ArrayItem":
+        return ArrayItem(self, index)
+
+    def __call__(self, frame: int) -> np.ndarray:
+        # Memoized values are copied, so changing the returned array doesn't change them.
+        if _context is not None:
+            return _context.get(self, frame).copy()
+        return self.get_value(frame)
+
+    def convert(self, value: Any, count: int) -> np.ndarray:
+        """
+        Returns value broadcast to the values of count instances.
+        Meant for internal use.
+        """
+        value = np.asarray(value, dtype=self.sample_dtype)
+        return np.broadcast_to(value, (count,)+self.shape[1:]).copy()
+
+    def keyframe(self, value: Any, frame: int, interp: str = None, index: Any = None) -> None:
+        """
+        Adds a keyframe for some or all instances.
+        :param value: Value of all selected instances, or an array of the value of each selected instance.
+        :param frame: Frame to insert a keyframe.
+        :param interp: Keyframe interpolation. Uses self.default_interp if set to None.
+        :param index: Instances to keyframe, as an index, slice, array of indices or boolean mask. Keyframes all instances if None.
+        """
+        if interp is None:
+            interp = self.default_interp
+        if interp not in self.allowed_interps:
+            raise ValueError(f"Interpolation {interp} not allowed.")
+
+        instances = np.atleast_1d(np.arange(self.shape[0])[slice(None) if index is None else index])
+        mask = np.zeros(self.shape[0], dtype=bool)
+        mask[instances] = True
+        values = np.zeros(self.shape, dtype=self.sample_dtype)
+        values[instances] = self.convert(value, len(instances))
+
+        idx = bisect_right(self._frames, frame)
+        self._keyframes.insert(idx, Keyframe(frame, (mask, values), interp))
+        self._frames.insert(idx, frame)
+        self._arrays = None
+        bump_revision()
+
+    def get_arrays(self) -> Tuple[np.ndarray]:
+        """
+        Returns the keyframes as arrays (frames, values, interps, prev_key, next_key).
+        prev_key[k, i] is the last keyframe at or before keyframe k that has instance i (-1 if none),
+        and next_key[k, i] is the first keyframe at or after keyframe k that has instance i (len(frames) if none).
+        Meant for internal use.
+        """
+        if self._arrays is None:
+            num_keys = len(self._keyframes)
+            frames = np.array(self._frames)
+            has = np.stack([key.value[0] for key in self._keyframes])
+            values = np.stack([key.value[1] for key in self._keyframes])
+            interps = np.array([key.interp for key in self._keyframes])
+            rows = np.arange(num_keys)[:, None]
+            prev_key = np.maximum.accumulate(np.where(has, rows, -1), axis=0)
+            next_key = np.minimum.accumulate(np.where(has, rows, num_keys)[::-1], axis=0)[::-1]
+            self._arrays = (frames, values, interps, prev_key, next_key)
+        return self._arrays
+
+    def find_instance_keys(self, frame: int) -> Tuple[np.ndarray]:
+        """
+        Returns the keyframe of each instance at or before frame (-1 if none), and after frame (number of keyframes if none).
+        Meant for internal use.
+        """
+        frames, values, interps, prev_key, next_key = self.get_arrays()
+        num_keys, count = len(frames), self.shape[0]
+        row = self.find_keyframe(frame)
+        low = prev_key[row] if row >= 0 else np.full(count, -1)
+        high = next_key[row+1] if row+1 < num_keys else np.full(count, num_keys)
+        return low, high
+
+    def get_value(self, frame: int) -> np.ndarray:
+        """
+        Gets the values of all instances at frame. Instances without keyframes have their initial value.
+        :param frame: Frame to get value. The value will change based on the keyframes.
+        """
+        result = self._default_val.copy()
+        if len(self._keyframes) == 0:
+            return result
+
+        frames, values, interps, prev_key, next_key = self.get_arrays()
+        low, high = self.find_instance_keys(frame)
+        instances = np.arange(self.shape[0])
+        has_low, has_high = low >= 0, high < len(frames)
+
+        # Before the first keyframe of an instance, and after its last keyframe.
+        mask = has_high & ~has_low
+        result[mask] = values[high[mask], instances[mask]]
+        mask = has_low & ~has_high
+        result[mask] = values[low[mask], instances[mask]]
+
+        between = has_low & has_high
+        for interp in np.unique(interps[low[between]]):
+            mask = between & (interps[np.maximum(low, 0)] == interp)
+            key1, key2, inst = low[mask], high[mask], instances[mask]
+            fac = (frame-frames[key1]) / (frames[key2]-frames[key1])
+            fac = fac.reshape(fac.shape + (1,)*(len(self.shape)-1))
+            value = interpolate_array(interp, fac, values[key1, inst], values[key2, inst])
+            result[mask] = np.trunc(value) if self.dtype is int else value
+
+        return result
+
+    def sample(self, frames: np.ndarray) -> np.ndarray:
+        """
+        Gets values at many frames at once, as an array of shape (len(frames), *shape).
+        :param frames: Array of frames.
+        """
+        return np.stack([self.get_value(frame) for frame in np.asarray(frames)])
+
+    def static_range(self, frame: int) -> Tuple[float]:
+        """
+        Returns (start, end) of the frame range around frame where no instance changes.
+        :param frame: Frame to check.
+        """
+        if len(self._keyframes) == 0:
+            return (-inf, inf)
+
+        frames, values, interps, prev_key, next_key = self.get_arrays()
+        row = self.find_keyframe(frame)
+        start = frames[row] if row >= 0 else -inf
+        end = frames[row+1] if row+1 < len(frames) else inf
+        if row < 0 or row+1 >= len(frames):
+            return (start, end)
+
+        low, high = self.find_instance_keys(frame)
+        mask = (low >= 0) & (high < len(frames))
+        inst = np.arange(self.shape[0])[mask]
+        key1, key2 = low[mask], high[mask]
+        value1, value2 = values[key1, inst], values[key2, inst]
+        same = (value1 == value2).reshape(len(inst), -1).all(axis=1)
+        if np.all(same | (interps[key1] == "CONSTANT")):
+            return (start, end)
+        return (frame, frame)
+
+
+class ArrayItem:
+    """
+    One instance of an ArrayProp, which can be keyframed like a separate property, e.g. polygon.verts[i].
+    Keyframes are inserted into the ArrayProp with its index argument.
+    """
+
+    prop: ArrayProp
+    index: int
+
+    def __init__(self, prop: ArrayProp, index: int) -> None:
+        """
+        :param prop: Array property of the instance.
+        :param index: Index of the instance.
+        """
+        if not -len(prop) <= index < len(prop):
+            raise IndexError("Instance index out of range.")
+        self.prop = prop
+        self.index = index % len(prop)
+
+    def __repr__(self):
+        return f"<ArrayItem object, index={self.index}>"
+
+    def __call__(self, frame: int) -> Any:
+        return self.prop(frame)[self.index].tolist()
+
+    def keyframe(self, value: Any, frame: int, interp: str = None) -> None:
+        """
+        Adds a keyframe for this instance.
+        :param value: Value of the instance.
+        :param frame: Frame to insert a keyframe.
+        :param interp: Keyframe interpolation. Uses the default interpolation of the ArrayProp if set to None.
+        """
+        self.prop.keyframe(value, frame, interp, index=self.index)
+
+    def get_value(self, frame: int) -> Any:
+        return self.prop.get_value(frame)[self.index].tolist()
@@ -17,13 +17,22 @@
 #  along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 
-from typing import List, Tuple
+from typing import Any, List, Tuple
+import numpy as np
 import pygame
 from .props import *
 from .elements import BaseElement
+from .cache import LRUCache, StaticCache
 pygame.init()
 
 
+def get_nbytes(image: np.ndarray) -> int:
+    """
+    Returns the size of an image in bytes. Used as sizeof of the subframe cache, because lambdas can't be pickled.
+    """
+    return image.nbytes
+
+
 class Scene:
     """Scene object."""
 
@@ -34,6 +43,9 @@ class Scene:
     elements: List[BaseElement]
     bg_col: VectorProp
     motion_blur: bool
+    static_cache: StaticCache
+    subframe_cache: LRUCache
+    bake_table: BakeTable
 
     def __init__(self, start: int, end: int, step: int = 1, bg_col: Tuple[int] = (0, 0, 0, 0),
             before_pause: int = 30, after_pause: int = 30, motion_blur: bool = False) -> None:
@@ -45,7 +57,7 @@ class Scene:
         :param bg_col: Background color of scene.
         :param before_pause: Pause (frames) before the scene starts.
         :param after_pause: Pause (frames) after the scene starts.
-        :param motion_blur: Whether to use simple motion blur. Increases export time significantly.
+        :param motion_blur: Whether to use motion blur. Only frames with moving elements are slower to render.
         """
         self.start = start
         self.end = end
@@ -54,6 +66,10 @@ class Scene:
         self.elements = []
         self.bg_col = VectorProp(4, IntProp, bg_col)
         self.motion_blur = motion_blur
+        self.static_cache = StaticCache()
+        self.subframe_cache = LRUCache(get_mb_cache(), get_nbytes)
+        self.bake_table = None
+        self._fingerprint_props = None
 
     def get_frames(self) -> List[int]:
         """
@@ -61,6 +77,65 @@ class Scene:
         """
         return list(range(self.start, self.end+sum(self.pause), self.step))
 
+    def bake(self) -> BakeTable:
+        """
+        Evaluates every animated property of the scene over all frames into a table,
+        which elements read from while rendering. Used by exporters before rendering.
+        Inserting keyframes after baking is safe, the table just isn't used anymore.
+        """
+        frames = self.get_frames()
+        self.bake_table = BakeTable((self.bg_col, self.elements), min(frames)-self.pause[0], max(frames)+1)
+        return self.bake_table
+
+    def unbake(self) -> None:
+        """
+        Removes the table created by bake.
+        """
+        if self.bake_table is not None:
+            self.bake_table.detach()
+            self.bake_table = None
+
+    def get_fingerprint(self, frame: int) -> Tuple[Any]:
+        """
+        Returns a hashable fingerprint of everything that affects the rendered frame,
+        built from the evaluated property values and visibility of each element.
+        Frames with equal fingerprints render to the same image.
+        :param frame: Frame to fingerprint.
+        """
+        element_props = self.get_element_props()
+
+        if self.motion_blur:
+            times = [frame + fac*get_mb_step()*i for i in range(get_mb_frames()) for fac in (1, -1)]
+        else:
+            times = [frame]
+
+        fingerprint = []
+        for time in times:
+            fingerprint.append(tuple(self.bg_col(time)))
+            for element, props in zip(self.elements, element_props):
+                if not element.show(time):
+                    fingerprint.append(None)
+                elif not element.cacheable:
+                    # The element can change without its props changing, so this frame is unique.
+                    # Groups aren't cacheable if any element inside them isn't, see Group.cacheable.
+                    fingerprint.append(("FRAME", time))
+                else:
+                    values = (p(time-self.pause[0]) for p in props)
+                    # Arrays (of array props) are compared by their bytes.
+                    fingerprint.append(tuple(v.tobytes() if isinstance(v, np.ndarray) else v for v in values))
+
+        return tuple(fingerprint)
+
+    def get_element_props(self) -> List[Tuple[Property]]:
+        """
+        Returns a tuple of all properties of each element, in the order of self.elements.
+        Meant for internal use.
+        """
+        key = (get_revision(), tuple(self.elements))
+        if self._fingerprint_props is None or self._fingerprint_props[0] != key:
+            self._fingerprint_props = (key, [tuple(iter_props(element)) for element in self.elements])
+        return self._fingerprint_props[1]
+
     def add_element(self, element: BaseElement) -> None:
         """
         Appends element.
@@ -74,13 +149,16 @@ class Scene:
     def render_frame(self, res, frame) -> pygame.Surface:
         """
         Renders single frame with no motion blur.
+        Property values are memoized while rendering, see props.frame_context.
         Meant for internal use.
         """
         surface = pygame.Surface(res, pygame.SRCALPHA)
-        surface.fill(self.bg_col(frame))
-        for element in self.elements:
-            if element.show(frame):
-                surface.blit(element.render(res, frame-self.pause[0]), (0, 0))
+        with frame_context():
+            surface.fill(self.bg_col(frame))
+            for element in self.elements:
+                if element.show(frame):
+                    surf, loc = self.static_cache.render(element, res, frame-self.pause[0])
+                    surface.blit(surf, loc)
         return surface
 
     def render(self, res, frame) -> pygame.Surface:
@@ -92,26 +170,86 @@ class Scene:
         final_surface = pygame.Surface(res)
 
         if self.motion_blur:
-            surface = pygame.Surface(res, pygame.SRCALPHA)
-            mb_frames = get_mb_frames()
-            mb_step = get_mb_step()
-
-            for offset in reversed([mb_step*i for i in range(mb_frames)]):
-                for fac in (1, -1):
-                    curr_alpha = 255 * offset / (mb_frames*mb_step)
-                    color = (0, 0, 0, int(curr_alpha))
-                    mask_surf = pygame.Surface(res, pygame.SRCALPHA)
-                    mask_surf.fill(color)
-
-                    curr_frame = frame + fac*offset
-                    curr_surf = self.render_frame(res, curr_frame)
-                    curr_surf.blit(mask_surf, (0, 0))
-                    surface.blit(curr_surf, (0, 0))
-
-            final_surface.blit(surface, (0, 0))
+            image = self.render_motion_blur(res, frame)
+            pygame.surfarray.blit_array(final_surface, image)
 
         else:
             surface = self.render_frame(res, frame)
             final_surface.blit(surface, (0, 0))
 
         return final_surface
+
+    def render_motion_blur(self, res, frame) -> np.ndarray:
+        """
+        Renders frame with motion blur, as an RGB array of shape (width, height, 3).
+        Subframes in the shutter interval are averaged in a float buffer with a triangular falloff.
+        Only moving elements are rendered again for each subframe (others come from the static cache),
+        the number of subframes depends on how far elements move, and subframes are shared with
+        nearby frames whose shutter intervals overlap.
+        Meant for internal use.
+        """
+        mb_step = get_mb_step()
+        radius = get_mb_frames() - 1
+        start, end = frame - radius*mb_step, frame + radius*mb_step
+
+        # Find properties that change during the shutter interval.
+        # Subframes can only be skipped if all of them are distances in pixels, see BaseElement.pixel_props.
+        moving = []
+        static = pixels_only = self.bg_col.static_range(start)[1] > end
+        for element, props in zip(self.elements, self.get_element_props()):
+            if not element.cacheable:
+                static = pixels_only = False
+                continue
+            prop_start, prop_end = static_range(props, start-self.pause[0])
+            shown = element.show.static_range(start)[1] > end
+            if prop_start <= start-self.pause[0] and prop_end > end-self.pause[0] and shown:
+                continue
+            static = False
+            pixels_only &= shown
+
+            pixel_props = set(map(id, iter_props([getattr(element, name) for name in element.pixel_props])))
+            for prop in props:
+                prop_start, prop_end = prop.static_range(start-self.pause[0])
+                if prop_start <= start-self.pause[0] and prop_end > end-self.pause[0]:
+                    continue
+                if id(prop) in pixel_props:
+                    moving.append(prop)
+                else:
+                    pixels_only = False
+
+        if static:
+            surface = pygame.Surface(res)
+            surface.blit(self.render_frame(res, frame), (0, 0))
+            return pygame.surfarray.array3d(surface)
+
+        # Use the largest power of 2 stride (in subframes) where nothing moves more than MB_PIXEL_STEP pixels.
+        stride = 1
+        if moving and pixels_only:
+            times = np.arange(-radius, radius+1) * mb_step + frame - self.pause[0]
+            values = np.concatenate([p.sample(times).reshape(len(times), -1).T for p in moving]).astype(float)
+            while 2*stride <= radius:
+                if np.abs(values[:, 2*stride:] - values[:, :-2*stride]).max() > get_mb_pixel_step():
+                    break
+                stride *= 2
+
+        # Subframes are on a global grid of MB_STEP, so nearby frames can reuse them.
+        if self.subframe_cache.max_size != get_mb_cache():
+            self.subframe_cache = LRUCache(get_mb_cache(), get_nbytes)
+        grid = round(frame / mb_step)
+        buffer = np.zeros((*res, 3), dtype=np.float32)
+        total_weight = 0
+        for offset in range(-(radius//stride)*stride, radius+1, stride):
+            key = (tuple(res), get_revision(), grid+offset)
+            image = self.subframe_cache.get(key)
+            if image is None:
+                surface = pygame.Surface(res)
+                surface.blit(self.render_frame(res, (grid+offset)*mb_step), (0, 0))
+                image = pygame.surfarray.array3d(surface)
+                self.subframe_cache.put(key, image)
+
+            weight = float(radius + 1 - abs(offset))
+            buffer += weight * image
+            total_weight += weight
+
+        buffer /= total_weight
+        return np.round(buffer).astype(np.uint8)
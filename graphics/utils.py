@@ -18,6 +18,7 @@
 #
 
 import os
+import sys
 from typing import Tuple
 import pygame
 import cv2
@@ -29,13 +30,29 @@ def get_parent():
     return os.path.realpath(os.path.dirname(__file__))
 
 
+def get_cache_path(*names: str) -> str:
+    """
+    Returns a path in the cache directory, which is options.CACHE_DIR or graphic_videos in the user's cache directory.
+    Files kept between runs go there instead of the package directory, which may be read only or a git checkout.
+    :param names: Names of directories and file inside the cache directory.
+    """
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        if sys.platform == "win32" and "LOCALAPPDATA" in os.environ:
+            base = os.environ["LOCALAPPDATA"]
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        cache_dir = os.path.join(base, "graphic_videos")
+    return os.path.join(cache_dir, *names)
+
+
 def cv2img2surf(img) -> pygame.Surface:
     """
     Converts cv2 image to pygame surface.
     :param img: numpy.ndarray (cv2 image) to convert.
     """
     img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    surf = pygame.image.frombuffer(img.tostring(), img.shape[1::-1], "RGB")
+    surf = pygame.image.frombuffer(img.tobytes(), img.shape[1::-1], "RGB")
     return surf
 
 
@@ -45,3 +62,18 @@ def get_color(color) -> Tuple[int]:
     :param color: 
     """
     return get_col_palette()[color] if color in get_col_palette() else color
+
+
+def clip_bbox(loc: Tuple[int], size: Tuple[int], res: Tuple[int]) -> Tuple[Tuple[int], Tuple[int]]:
+    """
+    Returns the location and size of the part of a bounding box that is inside the frame.
+    The size is (0, 0) if none of it is.
+    :param loc: Top left corner (x, y) of the bounding box.
+    :param size: Size (x, y) of the bounding box.
+    :param res: Resolution of the frame.
+    """
+    x1, y1 = max(loc[0], 0), max(loc[1], 0)
+    x2, y2 = min(loc[0]+size[0], res[0]), min(loc[1]+size[1], res[1])
+    if x2 <= x1 or y2 <= y1:
+        return (0, 0), (0, 0)
+    return (x1, y1), (x2-x1, y2-y1)
@@ -0,0 +1,412 @@
+#
+#  Graphic Videos
+#  An API for creating graphic videos in Python.
+#  Copyright Medilocus 2021
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import os
+import shutil
+import atexit
+import threading
+import subprocess
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+from hashlib import blake2b
+import numpy as np
+import cv2
+from .options import *
+from .utils import get_cache_path
+
+# Decoders with a running thread.
+running = set()
+
+# Content hashes of files, keyed by (path, modification time, size).
+file_hashes: Dict[Tuple, str] = {}
+
+
+class VideoDecoder:
+    """
+    Decodes frames of a video file in a background thread, ahead of the frame being rendered.
+    Decoded frames are resized and kept in a ring buffer, so rendering frames in order rarely waits
+    for decoding, and jumping to a frame seeks to it instead of decoding from the start.
+    Seeking decodes from the last keyframe before the frame, so frames are only seeked to if a keyframe
+    is between the current position and the frame, see get_keyframes.
+    The thread is started on first use, so each process (e.g. export workers) has its own.
+    The thread only decodes and resizes, so sizes of frames are passed with each request.
+    """
+
+    src: str
+    length: int
+    fps: float
+    keyframes: List[int]
+    buffer_size: int
+    seek_distance: int
+
+    def __init__(self, src: str, buffer_size: int = None, seek_distance: int = None) -> None:
+        """
+        Initializes decoder and counts frames of the video.
+        :param src: Source path of video.
+        :param buffer_size: Number of decoded frames kept. Uses options.VIDEO_BUFFER if None.
+        :param seek_distance: Frames up to this far ahead are decoded instead of seeking if the keyframes of the video
+            are unknown. Uses options.VIDEO_SEEK if None.
+        """
+        self.src = src
+        self.buffer_size = get_video_buffer() if buffer_size is None else max(buffer_size, 2)
+        self.seek_distance = get_video_seek() if seek_distance is None else seek_distance
+
+        capture = cv2.VideoCapture(src)
+        self.fps = capture.get(cv2.CAP_PROP_FPS)
+        self.length = self.count_frames(capture)
+        capture.release()
+        self.keyframes = get_keyframes(src)
+
+        self.pid = None
+
+    def __getstate__(self):
+        # Captures and threads can't be pickled, so other processes start their own.
+        state = self.__dict__.copy()
+        for key in ("capture", "thread", "cond", "slots", "head", "want", "size", "last_size", "stopped", "error"):
+            state.pop(key, None)
+        state["pid"] = None
+        return state
+
+    def count_frames(self, capture: cv2.VideoCapture) -> int:
+        """
+        Returns the number of frames in the video.
+        The count in the container is checked by seeking to its last frame, and frames are counted
+        by grabbing them (without decoding) if it is wrong.
+        :param capture: Opened capture of the video.
+        """
+        count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        if count > 0 and capture.set(cv2.CAP_PROP_POS_FRAMES, count-1) and capture.grab():
+            while capture.grab():
+                count += 1
+            return count
+
+        capture.open(self.src)
+        count = 0
+        while capture.grab():
+            count += 1
+        return count
+
+    def start(self) -> None:
+        """
+        Opens the video and starts the decoding thread in this process.
+        Meant for internal use.
+        """
+        self.pid = os.getpid()
+        self.capture = cv2.VideoCapture(self.src)
+        self.cond = threading.Condition()
+        # Each slot is (video frame, size, RGB array). Frame i is kept in slot i % buffer_size.
+        self.slots: List[Tuple] = [(-1, None, None)] * self.buffer_size
+        self.head = 0
+        self.want = 0
+        # Frames ahead are resized to the size of the last request while it doesn't change,
+        # and keep their original size otherwise, so they are only resized once.
+        self.size = None
+        self.last_size = None
+        self.stopped = False
+        # Exception raised in the thread, which is raised again by get.
+        self.error = None
+        self.thread = threading.Thread(target=self.decode_loop, daemon=True)
+        self.thread.start()
+        running.add(self)
+
+    def close(self) -> None:
+        """
+        Stops the decoding thread and releases the video. It is restarted if another frame is requested.
+        """
+        if self.pid != os.getpid():
+            return
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.capture.release()
+        self.pid = None
+        running.discard(self)
+
+    def decode_loop(self) -> None:
+        """
+        Decodes frames from self.head onwards, until the buffer is full ahead of the last requested frame.
+        Exceptions stop the thread and are kept in self.error.
+        Meant for internal use.
+        """
+        try:
+            self.decode_frames()
+        except Exception as error:
+            with self.cond:
+                self.error = error
+                self.cond.notify_all()
+
+    def decode_frames(self) -> None:
+        """
+        Loop of the decoding thread, see decode_loop.
+        Meant for internal use.
+        """
+        # Keeps some frames before the requested frame, so stepping back doesn't seek.
+        behind = self.buffer_size // 4
+        pos = 0
+        while True:
+            with self.cond:
+                while not self.stopped and (self.head >= self.length or self.head >= self.want + self.buffer_size - behind):
+                    self.cond.wait()
+                if self.stopped:
+                    return
+                index = self.head
+                size = self.size
+
+            if not self.should_seek(pos, index):
+                while pos < index and self.capture.grab():
+                    pos += 1
+            else:
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+                pos = index
+            success, img = self.capture.read()
+            pos += 1
+
+            rgb = None
+            if success:
+                if size is None:
+                    size = img.shape[1::-1]
+                rgb = cv2.cvtColor(self.resize(img, size), cv2.COLOR_BGR2RGB)
+
+            with self.cond:
+                # The frame is dropped if another frame was requested meanwhile.
+                if self.head == index:
+                    self.slots[index % self.buffer_size] = (index, size, rgb)
+                    self.head += 1
+                    self.cond.notify_all()
+
+    def should_seek(self, pos: int, index: int) -> bool:
+        """
+        Returns whether frame index is reached faster from frame pos by seeking than by decoding the frames between.
+        Meant for internal use.
+        :param pos: Frame that would be decoded next.
+        :param index: Frame to reach.
+        """
+        if index < pos:
+            return True
+        if self.keyframes is None:
+            return index - pos > self.seek_distance
+        # Seeking decodes from the last keyframe at or before index, which only saves time if it is after pos.
+        return self.keyframes[max(bisect_right(self.keyframes, index)-1, 0)] > pos
+
+    @staticmethod
+    def resize(img: np.ndarray, size: Tuple[int]) -> np.ndarray:
+        """
+        Returns img resized to size, or img if it already has that size.
+        Meant for internal use.
+        """
+        height, width = img.shape[:2]
+        if (width, height) != size:
+            shrink = size[0] < width and size[1] < height
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA if shrink else cv2.INTER_LINEAR)
+        return img
+
+    def get(self, index: int, size: Tuple[int] = None) -> np.ndarray:
+        """
+        Returns frame index of the video as a (height, width, 3) RGB array, or None if the frame doesn't exist.
+        The array is shared, so it must not be changed.
+        :param index: Video frame to get.
+        :param size: Size (x, y) of the frame. Frames keep their original size if None.
+        """
+        if not 0 <= index < self.length:
+            return None
+        if self.pid != os.getpid():
+            self.start()
+        if size is not None:
+            size = tuple(size)
+
+        with self.cond:
+            self.want = index
+            self.size = size if size == self.last_size else None
+            self.last_size = size
+            slot = self.slots[index % self.buffer_size]
+            if slot[0] != index and self.should_seek(self.head, index):
+                self.head = index
+            self.cond.notify_all()
+            while slot[0] != index and self.error is None:
+                self.cond.wait()
+                slot = self.slots[index % self.buffer_size]
+            error = self.error
+
+        if error is not None:
+            # The thread has stopped, so it is started again by the next request.
+            self.close()
+            raise error
+
+        _, slot_size, rgb = slot
+        if rgb is not None and size is not None and size != slot_size:
+            rgb = self.resize(rgb, size)
+        return rgb
+
+
+def get_keyframes(src: str) -> List[int]:
+    """
+    Returns the sorted frames of a video that are keyframes. The packets of the video are listed with ffmpeg
+    without decoding them, and frames are numbered by presentation time.
+    Returns None if ffmpeg isn't installed or can't read the video.
+    :param src: Source path of video.
+    """
+    if shutil.which("ffmpeg") is None:
+        return None
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", src, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+
+    # Each line is "stream, dts, pts, duration, size, checksum", followed by ", F=0x.." if the flags aren't only "key".
+    packets = []
+    for line in result.stdout.splitlines():
+        fields = [field.strip() for field in line.split(",")]
+        if line.startswith("#") or len(fields) < 6 or not fields[2].lstrip("-").isdigit():
+            continue
+        flags = [int(field[2:], 16) for field in fields[6:] if field.startswith("F=")]
+        packets.append((int(fields[2]), bool(flags[0] & 1) if flags else True))
+
+    frames = {pts: frame for frame, pts in enumerate(sorted(pts for pts, key in packets))}
+    keyframes = sorted(frames[pts] for pts, key in packets if key)
+    return keyframes if keyframes else None
+
+
+def get_file_hash(path: str) -> str:
+    """
+    Returns a hash of the contents of a file, which is only computed once per process while the file doesn't change.
+    :param path: Path of file.
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in file_hashes:
+        hasher = blake2b(digest_size=16)
+        with open(path, "rb") as file:
+            while chunk := file.read(1024**2):
+                hasher.update(chunk)
+        file_hashes[key] = hasher.hexdigest()
+    return file_hashes[key]
+
+
+class FrameStore:
+    """
+    Decoded frames of a video at one size, stored in a raw RGB file with a fixed size per frame and read with numpy.memmap.
+    The file is in the videocache directory of the cache directory (see utils.get_cache_path) and is named by a hash
+    of the video's contents and the size, so later runs and other processes reuse it.
+    Frames are decoded the first time they are requested.
+    """
+
+    src: str
+    size: Tuple[int]
+    path: str
+    decoder: VideoDecoder
+    length: int
+
+    def __init__(self, src: str, size: Tuple[int]) -> None:
+        """
+        Initializes frame store.
+        :param src: Source path of video.
+        :param size: Size (x, y) of stored frames.
+        """
+        self.src = src
+        self.size = tuple(size)
+        self.decoder = VideoDecoder(src)
+        self.length = self.decoder.length
+
+        width, height = self.size
+        name = f"{get_file_hash(src)}_{width}x{height}"
+        self.path = get_cache_path("videocache", name)
+        self.frames = None
+        self.filled = None
+
+    def __getstate__(self):
+        # Memory maps would be pickled as copies, so other processes map the files again.
+        state = self.__dict__.copy()
+        state.update(frames=None, filled=None)
+        return state
+
+    def open(self) -> None:
+        """
+        Maps the frame file, and the file that marks which frames are stored. Missing files are created empty.
+        Meant for internal use.
+        """
+        width, height = self.size
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        shapes = {".rgb": (self.length, height, width, 3), ".filled": (self.length,)}
+        for ext, shape in shapes.items():
+            # Opening in append mode never truncates a file being filled by another process.
+            with open(self.path+ext, "ab") as file:
+                if file.tell() != np.prod(shape):
+                    file.truncate(np.prod(shape))
+        self.frames = np.memmap(self.path+".rgb", np.uint8, "r+", shape=shapes[".rgb"])
+        self.filled = np.memmap(self.path+".filled", np.uint8, "r+", shape=shapes[".filled"])
+
+    def num_stored(self) -> int:
+        """
+        Returns the number of frames that are stored.
+        """
+        if self.filled is None:
+            self.open()
+        return int(np.count_nonzero(self.filled))
+
+    def get(self, index: int) -> np.ndarray:
+        """
+        Returns frame index of the video as a (height, width, 3) RGB array, or None if the frame doesn't exist.
+        The frame is decoded and stored if it isn't stored yet.
+        :param index: Video frame to get.
+        """
+        if not 0 <= index < self.length:
+            return None
+        if self.frames is None:
+            self.open()
+
+        if not self.filled[index]:
+            rgb = self.decoder.get(index, self.size)
+            if rgb is None:
+                return None
+            self.frames[index] = rgb
+            # Marked after the frame is written, so other processes never read a partly written frame.
+            self.filled[index] = 1
+        return self.frames[index]
+
+    def remove(self) -> None:
+        """
+        Deletes the stored frames.
+        """
+        self.frames = self.filled = None
+        for ext in (".rgb", ".filled"):
+            if os.path.isfile(self.path+ext):
+                os.remove(self.path+ext)
+
+
+def remove_all_frames() -> None:
+    """
+    Deletes the stored frames of all videos. Stored frames are never deleted automatically.
+    """
+    shutil.rmtree(get_cache_path("videocache"), ignore_errors=True)
+
+
+def close_all() -> None:
+    """
+    Stops all decoding threads. Threads are stopped before exiting, because stopping
+    a thread while it is decoding crashes the interpreter.
+    """
+    for decoder in list(running):
+        decoder.close()
+
+
+atexit.register(close_all)